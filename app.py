@@ -2,20 +2,26 @@
 """
 Application Flask pour le chat sécurisé.
 Interface web conviviale avec mise à jour en temps réel via SSE (Server-Sent Events).
+
+Avec SECURE_CHAT_DAEMON=<socket>, l'UI se rattache à un daemon (daemon.py --ipc) qui
+détient la session : redémarrer l'UI ne coupe plus la connexion sécurisée.
 """
 import sys
 import os
 import threading
 import time
 import json
-from flask import Flask, render_template, request, jsonify, Response
+import collections
+from flask import Flask, render_template, request, jsonify, Response, send_file
 import logging
 import queue
 
 # Ajouter le path pour les imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from protocol.secure_protocol import SecureMessenger
+from protocol.secure_protocol import SecureMessenger, TRANSPORTS
+from protocol.reliability import MessageStore
+from diagnostics.profiler import CAPTURE, install_signal_handler
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
@@ -23,6 +29,16 @@ app.config['SECRET_KEY'] = os.urandom(24)
 # File de messages pour SSE
 message_queue = queue.Queue()
 
+# File store-and-forward (messages non acquittés), partagée entre sessions. Sur disque
+# (en clair) seulement si SECURE_CHAT_STORE est défini ; sinon en mémoire, comme le daemon.
+STORE_PATH = os.environ.get('SECURE_CHAT_STORE') or None
+
+# Socket IPC d'un daemon détenant la session (None = session dans ce processus)
+DAEMON_PATH = os.environ.get('SECURE_CHAT_DAEMON')
+
+# Résultats de livraison arrivés avant l'ajout du message à l'historique (bornés)
+EARLY_RESULTS_MAX = 256
+
 # État de l'application
 class AppState:
     def __init__(self):
@@ -31,7 +47,13 @@ class AppState:
         self.status = "Non connecté"
         self.is_secure = False
         self.fingerprint = None
+        self.peer_presence = None  # Dernier statut de présence du pair
+        self.rtt_ms = None         # RTT lissé mesuré par les heartbeats
         self.mode = None  # 'server' ou 'client'
+        self.store = None  # MessageStore, ouvert au premier démarrage
+        self.shards = None # ShardedServer (mode hub multi-processus, voir daemon.py --workers)
+        self.daemon = None # Socket IPC si la session est tenue par un daemon (IpcClient en messenger)
+        self.early_results = collections.OrderedDict()  # msg_id -> statut, voir send_message
         self.lock = threading.Lock()
 
 state = AppState()
@@ -62,31 +84,165 @@ def on_status_change(status_msg, is_secure, fingerprint=None):
             }
         })
 
+def on_presence(status_text):
+    """Appelé quand le pair annonce sa présence (sans garantie de livraison)."""
+    with state.lock:
+        state.peer_presence = status_text
+        message_queue.put({"type": "presence", "data": {"presence": status_text}})
+
+def on_rtt(rtt_ms):
+    """Appelé à chaque pong du pair (RTT lissé, en millisecondes)."""
+    with state.lock:
+        state.rtt_ms = rtt_ms
+        message_queue.put({"type": "rtt", "data": {"rtt_ms": rtt_ms}})
+
+def on_daemon_event(kind, data):
+    """Événement d'un daemon rattaché (IpcClient), converti vers les callbacks ci-dessus."""
+    if kind == 'snapshot':
+        # (Re)rattachement : l'état et l'historique du daemon font foi
+        with state.lock:
+            state.messages = data["messages"]
+            state.peer_presence = data["presence"]
+            state.rtt_ms = data["rtt_ms"]
+        on_status_change(data["status"], data["is_secure"], data["fingerprint"])
+    elif kind == 'message':
+        with state.lock:
+            # Nos propres messages sont déjà dans l'historique (route send_message)
+            if data.get("id") and any(m.get("id") == data["id"] for m in state.messages):
+                return
+            state.messages.append(data)
+            message_queue.put({"type": "message", "data": dict(data)})
+    elif kind == 'status':
+        on_status_change(data["status"], data["is_secure"], data["fingerprint"])
+    elif kind == 'delivery':
+        on_send_result(data["id"], data["status"], data["error"])
+    elif kind == 'presence':
+        on_presence(data["presence"])
+    elif kind == 'rtt':
+        on_rtt(data["rtt_ms"])
+
+def attach_daemon(path):
+    """Rattache l'UI au daemon (en arrière-plan) ; se rattache à nouveau s'il redémarre."""
+    from ipc.ipc_client import IpcClient
+
+    state.daemon = path
+
+    def run():
+        announced = False
+        while True:
+            client = IpcClient(path, on_event=on_daemon_event)
+            try:
+                client.connect()
+            except OSError as e:
+                if not announced:
+                    logging.warning(f"Daemon injoignable sur {path} ({e}), nouvel essai chaque seconde.")
+                    announced = True
+                time.sleep(1)
+                continue
+            announced = False
+            logging.info(f"Rattaché au daemon {path}")
+            with state.lock:
+                state.messenger = client
+            client.subscribe()
+            client.closed.wait()
+            with state.lock:
+                if state.messenger is client:
+                    state.messenger = None
+            time.sleep(1)
+
+    threading.Thread(target=run, daemon=True).start()
+
+def on_shard_event(session_id, kind, data):
+    """Événement d'un worker du serveur multi-processus (agrégé par ShardedServer)."""
+    if kind == 'rtt':
+        return  # Trop fréquent pour l'UI : visible au prochain rafraîchissement
+    message_queue.put({"type": "shard", "data": {"session": session_id, "kind": kind}})
+
+def on_send_result(msg_id, status, error=None):
+    """Appelé à chaque étape de livraison : sent, delivered (ACK du pair) ou queued."""
+    with state.lock:
+        for msg_obj in reversed(state.messages):
+            if msg_obj.get("id") == msg_id:
+                # Un "sent" tardif (redélivrance) ne doit pas masquer un "delivered"
+                if msg_obj.get("delivery") != "delivered":
+                    msg_obj["delivery"] = status
+                break
+        else:
+            # La route send_message n'a pas encore ajouté ce message (envoi hors verrou)
+            if state.early_results.get(msg_id) != "delivered":
+                state.early_results[msg_id] = status
+            if len(state.early_results) > EARLY_RESULTS_MAX:
+                state.early_results.popitem(last=False)  # Redélivrances d'une session passée
+        # Notification SSE
+        message_queue.put({
+            "type": "delivery",
+            "data": {"id": msg_id, "status": status, "error": error}
+        })
+
 # --- Routes Flask ---
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/api/start_server', methods=['POST'])
-def start_server():
-    """Démarre en mode serveur."""
-    data = request.get_json() or {}
-    port = int(data.get('port', 9999))
-    
+def launch_messenger(mode, port, ip=None, transport='tcp', heartbeat_interval=None,
+                     heartbeat_timeout=None, host='0.0.0.0'):
+    """
+    Crée le SecureMessenger et lance l'écoute / la connexion en arrière-plan.
+    Retourne un message d'erreur, ou None si le démarrage est lancé.
+    Utilisé par les routes et par le mode headless (daemon.py --web).
+    """
+    if transport not in TRANSPORTS:
+        return f"Transport inconnu : {transport}"
+    if state.daemon:
+        return "Session gérée par le daemon (IPC)"
+
     with state.lock:
         if state.messenger:
-            return jsonify({"success": False, "error": "Déjà connecté"})
+            return "Déjà connecté"
         
-        state.messenger = SecureMessenger(on_message_received, on_status_change)
-        state.mode = 'server'
+        if state.store is None:
+            state.store = MessageStore(STORE_PATH)
+        state.messenger = SecureMessenger(on_message_received, on_status_change,
+                                          on_send_result, state.store,
+                                          transport=transport, on_presence=on_presence,
+                                          on_rtt=on_rtt, heartbeat_interval=heartbeat_interval,
+                                          heartbeat_timeout=heartbeat_timeout)
+        state.mode = mode
         state.messages = []
+        state.peer_presence = None
+        state.rtt_ms = None
+        messenger = state.messenger
     
     # Démarrage dans un thread car c'est bloquant
     def run():
-        state.messenger.start_server(port)
+        if mode == 'server':
+            messenger.start_server(port, host)
+        else:
+            messenger.connect(ip, port)
     
     threading.Thread(target=run, daemon=True).start()
+    return None
+
+def launch_sharded(port, workers, host='0.0.0.0', heartbeat_interval=None, heartbeat_timeout=None):
+    """Démarre le hub multi-processus ; l'UI n'en affiche que l'état agrégé."""
+    from protocol.sharded_server import ShardedServer
+
+    state.shards = ShardedServer(port, workers, host, on_event=on_shard_event,
+                                 heartbeat_interval=heartbeat_interval,
+                                 heartbeat_timeout=heartbeat_timeout)
+    state.shards.start()
+
+@app.route('/api/start_server', methods=['POST'])
+def start_server():
+    """Démarre en mode serveur."""
+    data = request.get_json() or {}
+    port = int(data.get('port', 9999))
+    transport = data.get('transport', 'tcp')
+    
+    error = launch_messenger('server', port, transport=transport)
+    if error:
+        return jsonify({"success": False, "error": error})
     return jsonify({"success": True})
 
 @app.route('/api/connect', methods=['POST'])
@@ -95,19 +251,11 @@ def connect():
     data = request.get_json() or {}
     ip = data.get('ip')
     port = int(data.get('port', 9999))
+    transport = data.get('transport', 'tcp')
     
-    with state.lock:
-        if state.messenger:
-            return jsonify({"success": False, "error": "Déjà connecté"})
-        
-        state.messenger = SecureMessenger(on_message_received, on_status_change)
-        state.mode = 'client'
-        state.messages = []
-    
-    def run():
-        state.messenger.connect(ip, port)
-    
-    threading.Thread(target=run, daemon=True).start()
+    error = launch_messenger('client', port, ip, transport)
+    if error:
+        return jsonify({"success": False, "error": error})
     return jsonify({"success": True})
 
 @app.route('/api/send_message', methods=['POST'])
@@ -120,43 +268,162 @@ def send_message():
         return jsonify({"success": False, "error": "Message vide"})
     
     with state.lock:
-        if not state.messenger or not state.is_secure:
-            return jsonify({"success": False, "error": "Pas de session sécurisée"})
-        
-        if state.messenger.send_message(text):
-            # Ajouter à notre historique
-            msg_obj = {"from": "Moi", "text": text, "time": time.strftime("%H:%M:%S")}
-            state.messages.append(msg_obj)
-            message_queue.put({"type": "message", "data": msg_obj})
-            return jsonify({"success": True})
-        else:
-            return jsonify({"success": False, "error": "Erreur d'envoi"})
+        messenger = state.messenger if state.is_secure else None
+    if not messenger:
+        return jsonify({"success": False, "error": "Pas de session sécurisée"})
+
+    # Hors du verrou : avec un daemon, c'est une requête IPC (bloquante) et ses
+    # événements, traités sous ce verrou, ne doivent pas attendre la réponse.
+    # Le résultat arrive plus tard via on_send_result / événement SSE "delivery".
+    msg_id = messenger.queue_message(text)
+    if not msg_id:
+        return jsonify({"success": False, "error": "Message refusé (trop long ?)"})
+
+    with state.lock:
+        # Avec un daemon, son événement 'message' a pu précéder cette réponse
+        if state.daemon and any(m.get("id") == msg_id for m in reversed(state.messages)):
+            return jsonify({"success": True, "id": msg_id})
+
+        # Ajouter à notre historique (avec un "sent" / "delivered" déjà reçu)
+        msg_obj = {"id": msg_id, "from": "Moi", "text": text, "time": time.strftime("%H:%M:%S"),
+                   "delivery": state.early_results.pop(msg_id, "pending")}
+        state.messages.append(msg_obj)
+        # Copie : msg_obj["delivery"] est modifié ensuite par on_send_result
+        message_queue.put({"type": "message", "data": dict(msg_obj)})
+        return jsonify({"success": True, "id": msg_id})
+
+@app.route('/api/presence', methods=['POST'])
+def send_presence():
+    """Annonce notre présence au pair (fire-and-forget)."""
+    data = request.get_json() or {}
+    status_text = data.get('status', '').strip()[:64]
+
+    with state.lock:
+        messenger = state.messenger if state.is_secure else None
+    if not messenger or not status_text:
+        return jsonify({"success": False})
+    return jsonify({"success": messenger.send_presence(status_text)})
+
+@app.route('/api/confirm_sas', methods=['POST'])
+def confirm_sas():
+    """Le SAS a été vérifié avec le pair : libère les messages en attente pour lui."""
+    data = request.get_json() or {}
+
+    with state.lock:
+        messenger = state.messenger if state.is_secure else None
+    if not messenger:
+        return jsonify({"success": False, "error": "Pas de session sécurisée"})
+    # SAS affiché lors de la vérification : refusé si une autre session l'a remplacé
+    if not messenger.confirm_peer(data.get('fingerprint')):
+        return jsonify({"success": False, "error": "Le SAS a changé : vérifiez le nouveau code"})
+    return jsonify({"success": True})
 
 @app.route('/api/disconnect', methods=['POST'])
 def disconnect():
     """Ferme la connexion."""
     with state.lock:
-        if state.messenger:
-            state.messenger.close()
-            state.messenger = None
+        messenger, state.messenger = state.messenger, None
         state.is_secure = False
         state.fingerprint = None
+        state.rtt_ms = None
         state.status = "Déconnecté"
         state.mode = None
+    if messenger:
+        messenger.close()  # Hors du verrou : ses callbacks (statut "Déconnecté") le prennent
     return jsonify({"success": True})
 
 @app.route('/api/state')
 def get_state():
     """Retourne l'état actuel."""
+    with state.lock:
+        messenger = state.messenger
+    # Hors du verrou : requête IPC bloquante avec un daemon
+    session = messenger.get_session_status() if messenger else None
     with state.lock:
         return jsonify({
             "status": state.status,
             "is_secure": state.is_secure,
             "fingerprint": state.fingerprint,
+            "presence": state.peer_presence,
+            "rtt_ms": state.rtt_ms,
+            "session": session,
             "messages": state.messages,
             "mode": state.mode
         })
 
+@app.route('/api/shards')
+def get_shards():
+    """État agrégé des workers et sessions du hub multi-processus."""
+    if not state.shards:
+        return jsonify({"enabled": False})
+    return jsonify(dict(state.shards.snapshot(), enabled=True))
+
+@app.route('/api/shards/send', methods=['POST'])
+def send_to_shard():
+    """Envoie un message sur une session d'un worker."""
+    data = request.get_json() or {}
+    text = data.get('text', '').strip()
+    if not state.shards or not text:
+        return jsonify({"success": False, "error": "Hub inactif ou message vide"})
+    if not state.shards.send(data.get('session'), text):
+        return jsonify({"success": False, "error": "Session inconnue ou non sécurisée"})
+    return jsonify({"success": True})
+
+# --- Administration : capture de profilage à la demande ---
+
+def _admin_denied():
+    """Réponse d'erreur si la requête ne vient pas de la machine locale, sinon None."""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"success": False, "error": "Réservé à l'accès local"}), 403
+    return None
+
+@app.route('/api/admin/profile')
+def profile_status():
+    """État de la capture et archives disponibles."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    return jsonify(CAPTURE.status())
+
+@app.route('/api/admin/profile/start', methods=['POST'])
+def profile_start():
+    """Démarre une capture bornée (cProfile réception/envoi, tracemalloc, piles)."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if state.daemon:
+        return jsonify({"success": False,
+                        "error": "Session tenue par le daemon : kill -USR1 <pid du daemon>"})
+    data = request.get_json() or {}
+    try:
+        duration = CAPTURE.start(float(data.get('duration', 30)), bool(data.get('memory', True)))
+    except (RuntimeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)})
+    return jsonify({"success": True, "duration": duration})
+
+@app.route('/api/admin/profile/stop', methods=['POST'])
+def profile_stop():
+    """Arrête la capture avant l'échéance et indique l'archive à télécharger."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    path = CAPTURE.stop()
+    if not path:
+        return jsonify({"success": False, "error": "Aucune capture en cours"})
+    name = os.path.basename(path)
+    return jsonify({"success": True, "artifact": name, "download": f"/api/admin/profile/{name}"})
+
+@app.route('/api/admin/profile/<name>')
+def profile_download(name):
+    """Télécharge une archive produite par ce processus."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    path = CAPTURE.artifact_path(name)
+    if not path or not os.path.exists(path):
+        return jsonify({"success": False, "error": "Archive inconnue"}), 404
+    return send_file(path, as_attachment=True, download_name=name, mimetype='application/zip')
+
 @app.route('/stream')
 def stream():
     """SSE stream pour les mises à jour en temps réel."""
@@ -172,11 +439,19 @@ def stream():
     
     return Response(event_stream(), mimetype='text/event-stream')
 
-if __name__ == '__main__':
-    logging.basicConfig(level=logging.INFO)
+def run_web(host='0.0.0.0', port=5000):
+    """Lance le serveur web (bloquant)."""
     print("=" * 60)
     print("🔐 SECURE LAN CHAT - Interface Web")
     print("=" * 60)
-    print("Ouvrez votre navigateur à: http://127.0.0.1:5000")
+    browse_host = '127.0.0.1' if host in ('0.0.0.0', '') else host
+    print(f"Ouvrez votre navigateur à: http://{browse_host}:{port}")
     print("=" * 60)
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+    app.run(host=host, port=port, debug=False, threaded=True)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    install_signal_handler()  # kill -USR1 <pid> : démarre / arrête une capture de profilage
+    if DAEMON_PATH:
+        attach_daemon(DAEMON_PATH)
+    run_web()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Point d'entrée headless (sans navigateur) du chat sécurisé.
+Démarre l'écoute ou la connexion directement depuis la ligne de commande ou un
+fichier de configuration JSON, pour les relais sans surveillance.
+
+Flask et l'interface web ne sont importés qu'avec --web ; les primitives
+`cryptography` ne sont chargées qu'à la génération des clés, APRÈS l'ouverture du port.
+
+Exemples :
+    python daemon.py --listen 9999
+    python daemon.py --connect 192.168.1.20:9999
+    python daemon.py --config relay.json
+    python daemon.py --listen 9999 --web --web-port 5000
+    python daemon.py --listen 9999 --workers 16   # Hub multi-processus (SO_REUSEPORT)
+    python daemon.py --listen 9999 --ipc /tmp/chat.sock --no-stdin  # API locale pour les frontends
+    python daemon.py --attach /tmp/chat.sock      # Frontend CLI rattaché à ce daemon
+
+Messages en attente (--store) : ils ne sont redélivrés qu'après vérification
+du SAS avec le pair ; taper `/confirmer` (ou `/confirmer <SAS>`) sur l'entrée standard.
+
+Profilage à la demande : `kill -USR1 <pid>` démarre une capture de 30 s (un second
+signal l'arrête avant) ; l'archive zip est écrite dans --profile-dir.
+"""
+import sys
+import os
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+
+# Ajouter le path pour les imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# Valeurs par défaut, surchargées par le fichier de config puis par la ligne de commande
+DEFAULT_CONFIG = {
+    "mode": None,        # 'server', 'client' ou 'attach' (frontend d'un daemon --ipc)
+    "host": "0.0.0.0",   # Interface d'écoute (mode serveur et interface web)
+    "port": 9999,
+    "transport": "tcp",  # 'tcp' ou 'udp'
+    "workers": 1,        # > 1 : serveur multi-processus (une session par connexion entrante)
+    "peer_ip": None,     # Adresse du pair (mode client)
+    "web": False,        # Active l'interface Flask
+    "web_port": 5000,
+    "stdin": True,       # Lit les messages à envoyer sur l'entrée standard
+    "store": None,       # Fichier SQLite store-and-forward (None = mémoire)
+    "heartbeat": None,   # Secondes entre deux heartbeats (None = 2 s, 0 = désactivé)
+    "heartbeat_timeout": None, # Silence du pair avant fermeture (None = 6 s)
+    "ipc": None,         # Socket Unix de l'API locale (frontends rattachés)
+    "profile_dir": None, # Archives de profilage (None = dossier temporaire du système)
+}
+
+def load_config(path):
+    """Charge un fichier de configuration JSON (clés de DEFAULT_CONFIG)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    unknown = set(data) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Clés de configuration inconnues : {', '.join(sorted(unknown))}")
+    return data
+
+def parse_peer(value):
+    """Découpe 'ip:port' (le port est optionnel)."""
+    ip, sep, port = value.rpartition(':')
+    if not sep:
+        return value, None
+    return ip, int(port)
+
+def build_config(argv=None):
+    """Fusionne valeurs par défaut, fichier de config et arguments CLI."""
+    parser = argparse.ArgumentParser(description="Secure LAN Chat - mode headless")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--listen', metavar='PORT', type=int, help="Mode serveur sur ce port")
+    target.add_argument('--connect', metavar='IP[:PORT]', help="Mode client vers ce pair")
+    target.add_argument('--attach', metavar='SOCKET',
+                        help="Frontend CLI rattaché à un daemon lancé avec --ipc")
+    parser.add_argument('--host', help="Interface d'écoute, session et interface web (défaut 0.0.0.0)")
+    parser.add_argument('--transport', choices=('tcp', 'udp'), help="Transport (défaut tcp)")
+    parser.add_argument('--workers', type=int, help="Processus workers en mode serveur (SO_REUSEPORT)")
+    parser.add_argument('--config', metavar='FICHIER', help="Fichier de configuration JSON")
+    parser.add_argument('--web', action='store_true', default=None, help="Active l'interface web")
+    parser.add_argument('--web-port', type=int, help="Port de l'interface web (défaut 5000)")
+    parser.add_argument('--store', metavar='FICHIER',
+                        help="File store-and-forward persistante (SQLite)")
+    parser.add_argument('--heartbeat', metavar='SECONDES', type=float,
+                        help="Intervalle des heartbeats (défaut 2, 0 = désactivé)")
+    parser.add_argument('--heartbeat-timeout', metavar='SECONDES', type=float,
+                        help="Silence du pair avant fermeture de la session (défaut 6)")
+    parser.add_argument('--ipc', metavar='SOCKET',
+                        help="Expose la session aux frontends locaux (socket Unix)")
+    parser.add_argument('--profile-dir', metavar='DOSSIER',
+                        help="Archives des captures de profilage (SIGUSR1)")
+    parser.add_argument('--no-stdin', dest='stdin', action='store_false', default=None,
+                        help="Ne pas lire les messages sur l'entrée standard")
+    args = parser.parse_args(argv)
+
+    config = dict(DEFAULT_CONFIG)
+    if args.config:
+        config.update(load_config(args.config))
+
+    if args.listen is not None:
+        config["mode"] = 'server'
+        config["port"] = args.listen
+    elif args.connect:
+        ip, port = parse_peer(args.connect)
+        config["mode"] = 'client'
+        config["peer_ip"] = ip
+        if port is not None:
+            config["port"] = port
+    elif args.attach:
+        config["mode"] = 'attach'
+        config["ipc"] = args.attach
+    for key in ("host", "transport", "workers", "web", "web_port", "stdin", "store",
+                "heartbeat", "heartbeat_timeout", "ipc", "profile_dir"):
+        value = getattr(args, key)
+        if value is not None:
+            config[key] = value
+
+    if config["mode"] not in ('server', 'client', 'attach'):
+        parser.error("Préciser --listen, --connect, --attach ou 'mode' dans le fichier de config.")
+    if config["mode"] == 'attach' and not config["ipc"]:
+        parser.error("Mode attach : socket IPC manquant.")
+    if config["mode"] == 'client' and not config["peer_ip"]:
+        parser.error("Mode client : adresse du pair manquante.")
+    if config["workers"] > 1 and (config["mode"] != 'server' or config["transport"] != 'tcp'):
+        parser.error("--workers n'existe qu'en mode serveur TCP.")
+    if config["ipc"] and config["mode"] != 'attach' and (config["web"] or config["workers"] > 1):
+        parser.error("--ipc : session headless unique (sans --web ni --workers).")
+    if config["heartbeat"] and config["heartbeat_timeout"] is not None \
+            and config["heartbeat_timeout"] <= config["heartbeat"]:
+        parser.error("--heartbeat-timeout doit dépasser --heartbeat.")
+    return config
+
+CONFIRM_COMMAND = '/confirmer'
+
+def handle_command(text, target):
+    """
+    Commande '/confirmer [SAS]' tapée sur stdin (target : SecureMessenger ou
+    IpcClient). Retourne False si `text` est un message ordinaire.
+    """
+    command, _, fingerprint = text.partition(' ')
+    if command != CONFIRM_COMMAND:
+        return False
+    if target.confirm_peer(fingerprint.strip() or None):
+        print("[SAS] Confirmé : redélivrance des messages en attente.", flush=True)
+    else:
+        print("[SAS] Refusé : pas de session sécurisée, ou SAS différent.", flush=True)
+    return True
+
+def run_headless(config):
+    """Session sans interface : journal sur la console, envoi depuis stdin."""
+    from protocol.secure_protocol import SecureMessenger
+    from protocol.reliability import MessageStore
+
+    stop = threading.Event()
+    result = {"code": 0}
+    ipc = None
+    if config["ipc"]:
+        from ipc.ipc_server import IpcServer
+        ipc = IpcServer(config["ipc"])
+
+    def on_message(plaintext):
+        print(f"[{time.strftime('%H:%M:%S')}] Pair: {plaintext}", flush=True)
+        if ipc:
+            ipc.on_message(plaintext)
+
+    def on_status(status_msg, is_secure, fingerprint=None):
+        line = f"[STATUS] {status_msg}"
+        if fingerprint:
+            line += f" (SAS: {fingerprint})"
+        print(line, flush=True)
+        if ipc:
+            ipc.on_status(status_msg, is_secure, fingerprint)
+        if status_msg.startswith("Erreur"):
+            result["code"] = 1
+            stop.set()
+        elif status_msg == "Déconnecté":
+            stop.set()
+
+    def on_presence(status_text):
+        print(f"[PRÉSENCE] Pair : {status_text}", flush=True)
+        if ipc:
+            ipc.on_presence(status_text)
+
+    def on_send_result(msg_id, status, error=None):
+        if status == "queued":
+            print(f"[FILE] Message {msg_id[:8]} en attente de redélivrance : {error}", flush=True)
+        if ipc:
+            ipc.on_send_result(msg_id, status, error)
+
+    messenger = SecureMessenger(on_message, on_status, on_send_result, MessageStore(config["store"]),
+                                transport=config["transport"], on_presence=on_presence,
+                                on_rtt=ipc.on_rtt if ipc else None,
+                                heartbeat_interval=config["heartbeat"],
+                                heartbeat_timeout=config["heartbeat_timeout"])
+    if ipc:
+        ipc.messenger = messenger
+        try:
+            ipc.start()
+        except OSError as e:
+            logging.error(f"API IPC indisponible : {e}")
+            return 1
+
+    def read_stdin():
+        for line in sys.stdin:
+            text = line.strip()
+            if text and not handle_command(text, messenger):
+                # Via l'API IPC, les frontends rattachés voient aussi ce message
+                (ipc.send_message if ipc else messenger.queue_message)(text)
+
+    def run():
+        if config["mode"] == 'server':
+            messenger.start_server(config["port"], config["host"])
+        else:
+            messenger.connect(config["peer_ip"], config["port"])
+        if config["stdin"]:
+            threading.Thread(target=read_stdin, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while not stop.wait(0.5):  # wait() avec timeout : reste interruptible par Ctrl+C
+            pass
+    except KeyboardInterrupt:
+        pass
+    messenger.close()
+    if ipc:
+        ipc.stop()
+    return result["code"]
+
+def run_attached(config):
+    """Frontend CLI d'un daemon --ipc : affiche ses événements, envoie depuis stdin."""
+    from ipc.ipc_client import IpcClient
+
+    def on_event(kind, data):
+        if kind == 'snapshot':
+            print(f"[STATUS] {data['status']}", flush=True)
+            for msg_obj in data["messages"]:
+                print(f"[{msg_obj['time']}] {msg_obj['from']}: {msg_obj['text']}", flush=True)
+        elif kind == 'message' and data["from"] == "Pair":
+            print(f"[{data['time']}] Pair: {data['text']}", flush=True)
+        elif kind == 'status':
+            print(f"[STATUS] {data['status']}", flush=True)
+        elif kind == 'presence':
+            print(f"[PRÉSENCE] Pair : {data['presence']}", flush=True)
+
+    client = IpcClient(config["ipc"], on_event)
+    try:
+        client.connect()
+    except OSError as e:
+        logging.error(f"Daemon injoignable sur {config['ipc']} : {e}")
+        return 1
+    client.subscribe()
+
+    def read_stdin():
+        for line in sys.stdin:
+            text = line.strip()
+            if text and not handle_command(text, client):
+                client.queue_message(text)
+
+    if config["stdin"]:
+        threading.Thread(target=read_stdin, daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda *_: client.closed.set())
+    try:
+        while not client.closed.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        pass
+    client.on_event = None  # Départ volontaire : pas de statut "Daemon injoignable"
+    client.detach()  # La session continue dans le daemon
+    return 0
+
+def run_sharded(config):
+    """Hub multi-processus sans interface : journal des sessions sur la console."""
+    from protocol.sharded_server import ShardedServer
+
+    stop = threading.Event()
+    result = {"code": 0, "failed": 0}
+
+    def on_event(session_id, kind, data):
+        if kind == 'worker' and data.get("error"):
+            print(f"[WORKER {data['pid']}] Erreur d'écoute : {data['error']}", flush=True)
+            result["failed"] += 1
+            if result["failed"] == config["workers"]:  # Plus aucun worker à l'écoute
+                result["code"] = 1
+                stop.set()
+        elif kind == 'status':
+            print(f"[{session_id}] {data['status']}", flush=True)
+        elif kind == 'message':
+            print(f"[{time.strftime('%H:%M:%S')}] [{session_id}] Pair: {data['text']}", flush=True)
+
+    server = ShardedServer(config["port"], config["workers"], config["host"], on_event,
+                           config["heartbeat"], config["heartbeat_timeout"])
+    server.start()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+    return result["code"]
+
+def run_with_web(config):
+    """Démarre la session puis sert l'interface web (import de Flask à la demande)."""
+    import app as web
+
+    if config["workers"] > 1:
+        web.launch_sharded(config["port"], config["workers"], config["host"],
+                           config["heartbeat"], config["heartbeat_timeout"])
+        web.run_web(config["host"], config["web_port"])
+        return 0
+
+    if config["store"]:
+        web.STORE_PATH = config["store"]
+    error = web.launch_messenger(config["mode"], config["port"], config["peer_ip"],
+                                 config["transport"], config["heartbeat"],
+                                 config["heartbeat_timeout"], host=config["host"])
+    if error:
+        logging.error(error)
+        return 1
+    web.run_web(config["host"], config["web_port"])
+    return 0
+
+def main(argv=None):
+    config = build_config(argv)
+    if config["mode"] == 'attach':
+        return run_attached(config)
+
+    from diagnostics.profiler import CAPTURE, install_signal_handler
+    if config["profile_dir"]:
+        CAPTURE.directory = config["profile_dir"]
+    install_signal_handler()
+    if config["web"]:
+        return run_with_web(config)
+    if config["workers"] > 1:
+        return run_sharded(config)
+    return run_headless(config)
+
+if __name__ == '__main__':
+    sys.exit(main())
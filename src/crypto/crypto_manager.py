@@ -1,11 +1,9 @@
 import os
 import hashlib
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import ec
-from cryptography.hazmat.primitives.kdf.hkdf import HKDF
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.hazmat.primitives import serialization
-from cryptography.exceptions import InvalidTag
+
+# Les primitives `cryptography` sont importées dans les méthodes, au premier usage :
+# un nœud headless atteint l'état "en écoute" sans payer le coût de chargement
+# de la bibliothèque (les imports suivants sont de simples lectures de sys.modules).
 
 class CryptoManager:
     """
@@ -28,6 +26,9 @@ class CryptoManager:
         Génère une paire de clés éphémère (ECDH sur SECP384R1).
         Retourne la clé publique sérialisée (PEM) pour l'envoi au pair.
         """
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives import serialization
+
         self.private_key = ec.generate_private_key(ec.SECP384R1())
         self.public_key = self.private_key.public_key()
         
@@ -45,6 +46,10 @@ class CryptoManager:
         if not self.private_key:
             raise ValueError("Clés locales non générées.")
 
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
         peer_public_key = serialization.load_pem_public_key(peer_public_key_pem)
         
         # ECDH Exchange
@@ -68,27 +73,31 @@ class CryptoManager:
 
         return self.fingerprint
 
-    def encrypt_message(self, plaintext_str):
+    def encrypt_message(self, plaintext_str, associated_data=None):
         """
         Chiffre un message texte avec AES-256-GCM.
+        associated_data : en-tête authentifié mais non chiffré (ex: numéro de séquence).
         Format sortie : [Nonce 12b][Ciphertext + Tag]
         """
         if not self.session_key:
             raise ValueError("Session non établie. Pas de clé de session.")
 
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
         # AES-GCM nécessite un nonce unique par message.
         aesgcm = AESGCM(self.session_key)
         nonce = os.urandom(12)
         
         data = plaintext_str.encode('utf-8')
         # encrypt retourne ciphertext + tag appele "ciphertext" dans la doc AESGCM
-        ciphertext_blob = aesgcm.encrypt(nonce, data, None)
+        ciphertext_blob = aesgcm.encrypt(nonce, data, associated_data)
         
         return nonce + ciphertext_blob
 
-    def decrypt_message(self, encrypted_blob):
+    def decrypt_message(self, encrypted_blob, associated_data=None):
         """
-        Déchiffre un blob binaire. Vérifie l'intégrité (Tag).
+        Déchiffre un blob binaire. Vérifie l'intégrité (Tag), y compris celle
+        des données associées qui doivent être identiques à l'envoi.
         """
         if not self.session_key:
             raise ValueError("Session non établie.")
@@ -99,10 +108,13 @@ class CryptoManager:
         nonce = encrypted_blob[:12]
         ciphertext_with_tag = encrypted_blob[12:]
         
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from cryptography.exceptions import InvalidTag
+
         aesgcm = AESGCM(self.session_key)
         
         try:
-            plaintext_bytes = aesgcm.decrypt(nonce, ciphertext_with_tag, None)
+            plaintext_bytes = aesgcm.decrypt(nonce, ciphertext_with_tag, associated_data)
             return plaintext_bytes.decode('utf-8')
         except InvalidTag:
             raise ValueError("Échec de l'intégrité du message ! Modification détectée ou clé incorrecte.")
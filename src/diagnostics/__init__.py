@@ -0,0 +1 @@
+# Diagnostics module
@@ -0,0 +1,364 @@
+import io
+import os
+import sys
+import time
+import signal
+import logging
+import tempfile
+import threading
+import traceback
+import collections
+
+# Python 3.12+ : cProfile passe par sys.monitoring, qui n'admet qu'UN profileur actif
+# par processus (le second enable() lève ValueError). Un profileur par thread n'y est
+# donc possible qu'avant 3.12 ; au-delà, la capture échantillonne les piles.
+DETERMINISTIC = sys.version_info < (3, 12)
+
+class ProfileCapture:
+    """
+    Capture de profilage à la demande sur un nœud en production, bornée dans le temps.
+    - Par rôle ('receive', 'send') : les points d'accroche testent `CAPTURE.active`
+      et n'appellent run() que pendant une capture (coût nul sinon). Le chiffrement
+      s'exécute dans ces threads : il apparaît dans leurs profils et dans une
+      section dédiée du rapport.
+      * Python < 3.12 : cProfile par thread (fichiers .prof pour snakeviz/pstats).
+      * Python >= 3.12 : échantillonnage des piles des threads en section profilée
+        (piles repliées .folded pour flamegraph.pl / speedscope).
+      Le profilage ne fait jamais échouer le traitement d'un paquet.
+    - tracemalloc : sites d'allocation encore vivants en fin de capture.
+    - Piles de tous les threads au début et à la fin.
+    Le résultat est une archive zip de rapports texte.
+    cProfile, tracemalloc, pstats et zipfile ne sont importés qu'à la première capture.
+    """
+
+    MAX_DURATION = 300   # Secondes
+    TOP_ENTRIES = 40     # Lignes par rapport
+    TRACE_DEPTH = 10     # Profondeur de pile retenue par tracemalloc
+    SAMPLE_INTERVAL = 0.002  # Secondes entre deux échantillons (mode échantillonnage)
+    SAMPLE_DEPTH = 64        # Cadres retenus par pile échantillonnée
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'secure_chat_profiles')
+        self.active = False        # Lu par les points d'accroche : doit rester un simple attribut
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.artifacts = []        # Noms des archives produites (ordre chronologique)
+        self._profiles = {}        # (rôle, nom du thread) -> cProfile.Profile
+        self._sampling = False     # Mode de la capture en cours (voir DETERMINISTIC)
+        self._sections = {}        # ident du thread -> (rôle, nom du thread), échantillonnage
+        self._samples = {}         # (rôle, nom du thread) -> Counter(pile -> échantillons)
+        self._sampler = None
+        self._sampler_stop = None
+        self._errors = []          # Profileur indisponible (autre outil actif...)
+        self._busy = 0             # Sections profilées en cours
+        self._local = threading.local()
+        self._timer = None
+        self._started_at = None
+        self._duration = None
+        self._memory = False
+        self._stacks_start = ""
+
+    def start(self, duration=30, memory=True, sampling=None):
+        """
+        Démarre une capture ; elle s'arrête seule après `duration` secondes.
+        sampling=None : échantillonnage seulement là où cProfile par thread est impossible.
+        """
+        import tracemalloc
+
+        duration = max(1, min(float(duration), self.MAX_DURATION))
+        with self.lock:
+            if self.active:
+                raise RuntimeError("Capture déjà en cours")
+            self._profiles = {}
+            self._samples = {}
+            self._sections = {}
+            self._errors = []
+            self._sampling = not DETERMINISTIC if sampling is None else sampling
+            if self._sampling:
+                self._sampler_stop = threading.Event()
+                self._sampler = threading.Thread(target=self._sample, name='profile-sampler',
+                                                 args=(self._sampler_stop, self._samples),
+                                                 daemon=True)
+                self._sampler.start()
+            self._stacks_start = self._dump_stacks()
+            # tracemalloc déjà actif (PYTHONTRACEMALLOC) : on ne l'arrêtera pas
+            self._memory = memory and not tracemalloc.is_tracing()
+            if self._memory:
+                tracemalloc.start(self.TRACE_DEPTH)
+            self._started_at = time.time()
+            self._duration = duration
+            self._timer = threading.Timer(duration, self._auto_stop)
+            self._timer.daemon = True
+            self._timer.start()
+            self.active = True
+        logging.info(f"Capture de profilage démarrée ({duration:.0f} s).")
+        return duration
+
+    def stop(self):
+        """Arrête la capture et écrit l'archive ; retourne son chemin (None si inactive)."""
+        import tracemalloc
+
+        with self.lock:
+            if not self.active:
+                return None
+            self.active = False
+            if self._timer:
+                self._timer.cancel()
+            # Laisser finir les sections profilées en cours (gestionnaires courts)
+            self.idle.wait_for(lambda: self._busy == 0, timeout=2.0)
+            if self._sampler:
+                self._sampler_stop.set()
+                self._sampler.join(1.0)
+                self._sampler = None
+            profiles, samples = self._profiles, self._samples
+            self._profiles, self._samples = {}, {}
+            elapsed = time.time() - self._started_at
+
+            memory_report = None
+            try:
+                if tracemalloc.is_tracing():
+                    memory_report = self._memory_report()
+            finally:
+                if self._memory:  # Même si le rapport échoue : ne pas laisser tracer le nœud
+                    tracemalloc.stop()
+            path = self._write_artifact(profiles, samples, elapsed, memory_report)
+            self.artifacts.append(os.path.basename(path))
+        logging.info(f"Capture de profilage terminée : {path}")
+        return path
+
+    def status(self):
+        with self.lock:
+            remaining = None
+            if self.active:
+                remaining = max(0.0, self._started_at + self._duration - time.time())
+            return {"active": self.active, "remaining_s": remaining,
+                    "mode": "sampling" if self._sampling else "cprofile",
+                    "artifacts": list(self.artifacts)}
+
+    def artifact_path(self, name):
+        """Chemin d'une archive produite par ce processus (None sinon)."""
+        with self.lock:
+            if name not in self.artifacts:
+                return None
+        return os.path.join(self.directory, name)
+
+    def run(self, role, func, *args):
+        """
+        Exécute `func(*args)` en l'attribuant à `role` pour le thread courant.
+        Une erreur du profileur est journalisée ; `func` s'exécute quand même.
+        """
+        if getattr(self._local, 'profiling', False):
+            return func(*args)  # Déjà profilé plus haut dans la pile (réception réseau -> protocole)
+        key = (role, threading.current_thread().name)
+        with self.lock:
+            active = self.active  # La capture a pu se terminer depuis le test de l'appelant
+            if active:
+                self._busy += 1
+                profile = None
+                if not self._sampling:
+                    profile = self._profiles.get(key)
+                    if profile is None:
+                        import cProfile
+                        profile = self._profiles[key] = cProfile.Profile()
+        if not active:
+            return func(*args)
+
+        ident = threading.get_ident()
+        enabled = False
+        self._local.profiling = True
+        try:
+            try:
+                if profile is None:
+                    self._sections[ident] = key  # Lu par le thread échantillonneur
+                else:
+                    profile.enable()
+                    enabled = True
+            except Exception as e:  # ValueError : autre profileur actif (sys.monitoring)
+                self._profiler_error(e)
+            return func(*args)
+        finally:
+            if enabled:
+                profile.disable()
+            self._sections.pop(ident, None)
+            self._local.profiling = False
+            with self.lock:
+                self._busy -= 1
+                self.idle.notify_all()
+
+    # --- Interne ---
+
+    def _auto_stop(self):
+        try:
+            self.stop()
+        except Exception as e:
+            logging.error(f"Erreur fin de capture: {e}")
+
+    def _profiler_error(self, error):
+        """Profileur indisponible : noté une fois dans le résumé, jamais propagé."""
+        with self.lock:
+            message = f"{type(error).__name__}: {error}"
+            if message in self._errors:
+                return
+            self._errors.append(message)
+        logging.warning(f"Profileur indisponible, section non profilée : {message}")
+
+    def _sample(self, stop, samples):
+        """(Thread échantillonneur) Pile de chaque thread en section profilée."""
+        while not stop.wait(self.SAMPLE_INTERVAL):
+            sections = self._sections.copy()
+            if not sections:
+                continue
+            frames = sys._current_frames()
+            for ident, key in sections.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and len(stack) < self.SAMPLE_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if stack:
+                    samples.setdefault(key, collections.Counter())[tuple(reversed(stack))] += 1
+
+    def _dump_stacks(self):
+        """Pile courante de chaque thread."""
+        names = {t.ident: t.name for t in threading.enumerate()}
+        out = io.StringIO()
+        for ident, frame in sys._current_frames().items():
+            out.write(f"--- Thread {names.get(ident, '?')} ({ident}) ---\n")
+            out.write("".join(traceback.format_stack(frame)))
+            out.write("\n")
+        return out.getvalue()
+
+    def _memory_report(self):
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        stats = snapshot.statistics('lineno')
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"Mémoire suivie : {current / 1024:.1f} Kio (pic {peak / 1024:.1f} Kio)",
+                 f"Top {self.TOP_ENTRIES} des sites d'allocation (encore vivants) :", ""]
+        lines += [str(stat) for stat in stats[:self.TOP_ENTRIES]]
+        return "\n".join(lines) + "\n"
+
+    def _profile_report(self, stats, title, restriction=None):
+        out = io.StringIO()
+        out.write(f"=== {title} ===\n")
+        stats.stream = out
+        stats.sort_stats('cumulative')
+        if restriction:
+            stats.print_stats(restriction, self.TOP_ENTRIES)
+        else:
+            stats.print_stats(self.TOP_ENTRIES)
+        return out.getvalue()
+
+    def _sample_report(self, stacks, title, restriction=None):
+        """Temps inclusif (fonction dans la pile) et propre (en sommet de pile), en %."""
+        total = sum(stacks.values())
+        inclusive = collections.Counter()
+        own = collections.Counter()
+        for stack, count in stacks.items():
+            for function in set(stack):
+                inclusive[function] += count
+            own[stack[-1]] += count
+        lines = [f"=== {title} ===",
+                 f"{total} échantillons (1 toutes les {self.SAMPLE_INTERVAL * 1000:.0f} ms)", "",
+                 " inclusif    propre  fonction"]
+        shown = 0
+        for function, count in inclusive.most_common():
+            if restriction and restriction not in function:
+                continue
+            lines.append(f"{100 * count / total:8.1f} % {100 * own[function] / total:7.1f} %  {function}")
+            shown += 1
+            if shown == self.TOP_ENTRIES:
+                break
+        return "\n".join(lines) + "\n"
+
+    def _write_artifact(self, profiles, samples, elapsed, memory_report):
+        import pstats
+        import zipfile
+
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        name = f"{time.strftime('profile-%Y%m%d-%H%M%S')}-{os.getpid()}-{len(self.artifacts) + 1}.zip"
+        path = os.path.join(self.directory, name)
+
+        # Un seul jeu de statistiques par rôle, tous threads confondus
+        by_role = {}
+        for (role, thread_name), profile in profiles.items():
+            try:
+                stats = pstats.Stats(profile, stream=io.StringIO())
+            except TypeError:
+                continue  # Jamais activé (enable() refusé) : aucune donnée
+            if role in by_role:
+                by_role[role][1].add(stats)
+                by_role[role][0].append(thread_name)
+            else:
+                by_role[role] = ([thread_name], stats)
+        by_role_samples = {}
+        for (role, thread_name), stacks in samples.items():
+            threads, merged = by_role_samples.setdefault(role, ([], collections.Counter()))
+            threads.append(thread_name)
+            merged.update(stacks)
+
+        mode = ("échantillonnage des piles" if self._sampling else "cProfile par thread")
+        summary = [f"Durée : {elapsed:.1f} s", f"PID : {os.getpid()}", f"Mode : {mode}", ""]
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for role, (threads, stats) in sorted(by_role.items()):
+                summary.append(f"{role} : threads {', '.join(threads)} "
+                               f"({stats.total_calls} appels, {stats.total_tt:.3f} s)")
+                report = self._profile_report(stats, f"Profil {role}")
+                report += "\n" + self._profile_report(stats, f"Chiffrement ({role})", 'crypto_manager')
+                archive.writestr(f"profile-{role}.txt", report)
+                dump = os.path.join(self.directory, f".{name}.{role}.prof")
+                stats.dump_stats(dump)
+                archive.write(dump, f"profile-{role}.prof")
+                os.remove(dump)
+            for role, (threads, stacks) in sorted(by_role_samples.items()):
+                summary.append(f"{role} : threads {', '.join(threads)} "
+                               f"({sum(stacks.values())} échantillons)")
+                report = self._sample_report(stacks, f"Profil {role}")
+                report += "\n" + self._sample_report(stacks, f"Chiffrement ({role})", 'crypto_manager')
+                archive.writestr(f"profile-{role}.txt", report)
+                # Format replié : "cadre;cadre;... nombre" (flamegraph.pl, speedscope)
+                archive.writestr(f"profile-{role}.folded", "".join(
+                    f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common()))
+            if not by_role and not by_role_samples:
+                summary.append("Aucune activité réseau profilée pendant la capture.")
+            for error in self._errors:
+                summary.append(f"Profileur indisponible : {error}")
+            if memory_report:
+                archive.writestr("memory.txt", memory_report)
+            archive.writestr("stacks-start.txt", self._stacks_start)
+            archive.writestr("stacks-end.txt", self._dump_stacks())
+            archive.writestr("summary.txt", "\n".join(summary) + "\n")
+        os.chmod(path, 0o600)
+        return path
+
+
+# Capture partagée par tout le processus (points d'accroche réseau et protocole)
+CAPTURE = ProfileCapture()
+
+def install_signal_handler(signum=None, duration=30):
+    """
+    Bascule la capture à chaque signal (SIGUSR1 par défaut) :
+    `kill -USR1 <pid>` démarre, un second signal arrête avant l'échéance.
+    Sans effet sur les systèmes sans SIGUSR1 (Windows).
+    """
+    signum = signum or getattr(signal, 'SIGUSR1', None)
+    if signum is None:
+        return False
+
+    def toggle():
+        if CAPTURE.active:
+            CAPTURE.stop()
+        else:
+            CAPTURE.start(duration)
+
+    def handler(*_):
+        # Hors du gestionnaire : stop() écrit l'archive et attend des verrous
+        threading.Thread(target=toggle, daemon=True).start()
+
+    signal.signal(signum, handler)
+    return True
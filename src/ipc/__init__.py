@@ -0,0 +1 @@
+# IPC module
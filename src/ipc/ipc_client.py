@@ -0,0 +1,143 @@
+import queue
+import socket
+import logging
+import threading
+
+from ipc.ipc_protocol import (OP_SUBSCRIBE, OP_SEND, OP_PRESENCE, OP_STATUS, OP_CLOSE,
+                              OP_CONFIRM, OP_RESULT, OP_EVENTS, pack_frame, read_frame)
+
+class IpcClient:
+    """
+    Frontend rattaché à un daemon (IpcServer) : mêmes méthodes d'envoi que
+    SecureMessenger (queue_message, send_presence, confirm_peer, get_session_status, close),
+    ce qui permet à l'UI de l'utiliser à la place d'une session locale.
+    - Les événements arrivent par lots et sont remis à on_event(kind, data) sur
+      un thread dédié : un callback lent (sérialisation UI) ne retarde ni les
+      réponses aux requêtes, ni le daemon.
+    - `closed` est positionné quand le daemon disparaît.
+    """
+
+    DETACHED_STATUS = "Daemon injoignable"
+
+    def __init__(self, path, on_event=None, timeout=5.0):
+        self.path = path
+        self.on_event = on_event  # (kind, data) : snapshot, status, message, delivery, presence, rtt
+        self.timeout = timeout
+        self.sock = None
+        self.closed = threading.Event()
+        self.lock = threading.Lock()
+        self.pending = {}          # req_id -> [Event, (valeur, erreur)]
+        self._next_id = 0
+        self._dispatch = queue.Queue()
+
+    def connect(self):
+        """Se rattache au daemon (OSError s'il n'écoute pas)."""
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(self.path)
+        except OSError:
+            self.sock.close()
+            raise
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._dispatch_loop, daemon=True).start()
+        return self
+
+    def subscribe(self):
+        """Demande l'instantané puis le flux d'événements."""
+        return self._send(OP_SUBSCRIBE)
+
+    def queue_message(self, text):
+        """Met un message en file dans le daemon ; retourne son identifiant (ou None)."""
+        return self._request(OP_SEND, text)
+
+    def send_presence(self, status_text):
+        return self._send(OP_PRESENCE, status_text)
+
+    def get_session_status(self):
+        return self._request(OP_STATUS)
+
+    def confirm_peer(self, fingerprint=None):
+        """SAS vérifié : le daemon redélivre les messages en attente pour ce pair."""
+        return bool(self._request(OP_CONFIRM, fingerprint))
+
+    def close(self):
+        """Ferme la session sécurisée DU DAEMON, puis se détache."""
+        self._send(OP_CLOSE)
+        self.detach()
+
+    def detach(self):
+        """Se détache sans toucher à la session du daemon."""
+        if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+
+    # --- Interne ---
+
+    def _send(self, op, value=None):
+        try:
+            data = pack_frame(op, value)
+            with self.lock:
+                self.sock.sendall(data)
+            return True
+        except (OSError, AttributeError) as e:
+            logging.warning(f"Envoi IPC impossible : {e}")
+            return False
+
+    def _request(self, op, *args):
+        """Requête avec réponse (OP_RESULT) ; None en cas d'erreur ou de délai dépassé."""
+        done = threading.Event()
+        with self.lock:
+            self._next_id += 1
+            req_id = self._next_id
+            self.pending[req_id] = [done, (None, "Daemon injoignable")]
+        if not self._send(op, [req_id, *args]) or not done.wait(self.timeout):
+            with self.lock:
+                self.pending.pop(req_id, None)
+            return None
+        value, error = self.pending.pop(req_id)[1]
+        if error:
+            logging.warning(f"Requête IPC refusée : {error}")
+            return None
+        return value
+
+    def _read_loop(self):
+        try:
+            while True:
+                frame = read_frame(self.sock)
+                if frame is None:
+                    break
+                op, value = frame
+                if op == OP_RESULT:
+                    req_id, result, error = value
+                    with self.lock:
+                        entry = self.pending.get(req_id)
+                    if entry:
+                        entry[1] = (result, error)
+                        entry[0].set()
+                elif op == OP_EVENTS:
+                    self._dispatch.put(value)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Lien IPC rompu : {e}")
+
+        self.closed.set()
+        with self.lock:
+            for done, _ in self.pending.values():
+                done.set()  # Les requêtes en attente échouent tout de suite
+        self._dispatch.put([('status', {"status": self.DETACHED_STATUS, "is_secure": False,
+                                        "fingerprint": None})])
+        self._dispatch.put(None)
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._dispatch.get()
+            if batch is None:
+                break
+            for kind, data in batch:
+                if self.on_event:
+                    try:
+                        self.on_event(kind, data)
+                    except Exception as e:
+                        logging.error(f"Erreur dans le callback on_event: {e}")
@@ -0,0 +1,132 @@
+"""
+Protocole IPC binaire entre le daemon et ses frontends (socket Unix local).
+
+Trame : [Longueur 4B][Opcode 1B][Valeur encodée]
+Valeur : encodage typé compact (1 octet de type, puis la donnée) :
+    N = None, T / F = booléen, i = entier 8B, d = flottant 8B,
+    s = chaîne UTF-8 [Longueur 4B][Octets], l = liste [Nombre 4B][Valeurs...],
+    m = dictionnaire [Nombre 4B][(clé chaîne, valeur)...]
+"""
+import struct
+
+# Frontend -> daemon
+OP_SUBSCRIBE = 0x01  # None : reçoit un instantané puis le flux d'événements
+OP_SEND      = 0x02  # [req_id, texte] -> OP_RESULT [req_id, msg_id, erreur]
+OP_PRESENCE  = 0x03  # texte (sans réponse, comme la présence réseau)
+OP_STATUS    = 0x04  # [req_id] -> OP_RESULT [req_id, état de session, erreur]
+OP_CLOSE     = 0x05  # None : ferme la session sécurisée du daemon
+OP_CONFIRM   = 0x06  # [req_id, SAS ou None] -> OP_RESULT [req_id, booléen, erreur]
+
+# Daemon -> frontend
+OP_RESULT = 0x81     # [req_id, valeur, erreur]
+OP_EVENTS = 0x82     # [[type, données], ...] : lot d'événements
+
+FRAME_HEADER = struct.Struct('!IB')
+MAX_FRAME = 16 * 1024 * 1024  # Garde-fou contre une longueur corrompue
+
+_INT = struct.Struct('!q')
+_FLOAT = struct.Struct('!d')
+_COUNT = struct.Struct('!I')
+
+def encode(value):
+    """Encode une valeur (None, bool, int, float, str, list, tuple, dict)."""
+    out = bytearray()
+    _encode_into(out, value)
+    return bytes(out)
+
+def _encode_into(out, value):
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, int):
+        out += b'i' + _INT.pack(value)
+    elif isinstance(value, float):
+        out += b'd' + _FLOAT.pack(value)
+    elif isinstance(value, str):
+        raw = value.encode('utf-8')
+        out += b's' + _COUNT.pack(len(raw)) + raw
+    elif isinstance(value, (list, tuple)):
+        out += b'l' + _COUNT.pack(len(value))
+        for item in value:
+            _encode_into(out, item)
+    elif isinstance(value, dict):
+        out += b'm' + _COUNT.pack(len(value))
+        for key, item in value.items():
+            _encode_into(out, str(key))
+            _encode_into(out, item)
+    else:
+        raise TypeError(f"Type non encodable en IPC : {type(value).__name__}")
+
+def decode(data):
+    """Décode une valeur complète ; ValueError si la donnée est invalide."""
+    try:
+        value, offset = _decode_from(data, 0)
+    except (struct.error, IndexError, UnicodeDecodeError, RecursionError) as e:
+        raise ValueError(f"Valeur IPC invalide : {e}") from e
+    if offset != len(data):
+        raise ValueError("Valeur IPC invalide : octets en trop")
+    return value
+
+def _decode_from(data, offset):
+    tag = data[offset:offset + 1]
+    offset += 1
+    if tag == b'N':
+        return None, offset
+    if tag == b'T':
+        return True, offset
+    if tag == b'F':
+        return False, offset
+    if tag == b'i':
+        return _INT.unpack_from(data, offset)[0], offset + _INT.size
+    if tag == b'd':
+        return _FLOAT.unpack_from(data, offset)[0], offset + _FLOAT.size
+    if tag in (b's', b'l', b'm'):
+        (count,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        if tag == b's':
+            if offset + count > len(data):
+                raise ValueError("chaîne tronquée")
+            return data[offset:offset + count].decode('utf-8'), offset + count
+        if tag == b'l':
+            items = []
+            for _ in range(count):
+                item, offset = _decode_from(data, offset)
+                items.append(item)
+            return items, offset
+        result = {}
+        for _ in range(count):
+            key, offset = _decode_from(data, offset)
+            result[key], offset = _decode_from(data, offset)
+        return result, offset
+    raise ValueError(f"type inconnu {tag!r}")
+
+def pack_frame(op, value=None):
+    """Construit une trame prête à envoyer."""
+    body = encode(value)
+    return FRAME_HEADER.pack(len(body) + 1, op) + body
+
+def read_frame(sock):
+    """Lit une trame complète : (opcode, valeur), ou None en fin de flux."""
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    length, op = FRAME_HEADER.unpack(header)
+    if not 1 <= length <= MAX_FRAME:
+        raise ValueError(f"Trame IPC de taille invalide : {length}")
+    body = _recv_exact(sock, length - 1)
+    if body is None:
+        return None
+    return op, decode(body)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
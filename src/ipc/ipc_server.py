@@ -0,0 +1,262 @@
+import os
+import stat
+import time
+import queue
+import socket
+import logging
+import threading
+import collections
+
+from ipc.ipc_protocol import (OP_SUBSCRIBE, OP_SEND, OP_PRESENCE, OP_STATUS, OP_CLOSE,
+                              OP_CONFIRM, OP_RESULT, OP_EVENTS, pack_frame, read_frame)
+
+class IpcServer:
+    """
+    API locale du daemon (socket Unix, mode 0600) : le SecureMessenger, ses
+    sockets et ses clés restent dans le daemon ; les frontends (UI Flask, CLI)
+    s'y rattachent et peuvent redémarrer sans couper la session.
+    - Les callbacks on_* ont la signature de ceux de SecureMessenger : le daemon
+      les appelle, l'état courant et un historique borné sont conservés ici.
+    - Un abonné reçoit d'abord un instantané ('snapshot'), puis le flux
+      d'événements, envoyé par lots (tout ce qui est en file part en une trame).
+    - Un abonné trop lent (file pleine) est déconnecté, jamais attendu.
+    """
+
+    HISTORY = 200        # Messages rejoués à un frontend qui se rattache
+    QUEUE_LIMIT = 10000  # Événements en attente par abonné
+    BATCH_MAX = 256      # Événements par trame OP_EVENTS
+
+    def __init__(self, path, messenger=None):
+        self.path = path
+        self.messenger = messenger  # SecureMessenger du daemon
+        self.sock = None
+        self.running = False
+        self.lock = threading.RLock()  # État, historique et liste des abonnés
+        self.clients = set()
+        self.subscribers = set()
+        self.session = {"status": "Non connecté", "is_secure": False, "fingerprint": None,
+                        "presence": None, "rtt_ms": None}
+        self.history = collections.deque(maxlen=self.HISTORY)
+
+    def start(self):
+        """Ouvre le socket Unix (OSError si un daemon l'utilise déjà)."""
+        if os.path.exists(self.path):
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                raise OSError(f"{self.path} existe et n'est pas un socket")
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                raise OSError(f"Un daemon écoute déjà sur {self.path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.path)  # Reste d'un daemon arrêté brutalement
+            finally:
+                probe.close()
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Créé directement en 0600 : seul l'utilisateur du daemon peut s'y rattacher
+        old_umask = os.umask(0o177)
+        try:
+            self.sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self.sock.listen(8)
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        logging.info(f"API IPC en écoute sur {self.path}")
+
+    def stop(self):
+        """Ferme le socket et détache tous les frontends."""
+        self.running = False
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        for client in list(self.clients):
+            client.close()
+
+    # --- Callbacks du SecureMessenger ---
+
+    def on_message(self, plaintext):
+        self.publish('message', {"from": "Pair", "text": plaintext, "time": time.strftime("%H:%M:%S")})
+
+    def on_status(self, status_msg, is_secure, fingerprint=None):
+        self.publish('status', {"status": status_msg, "is_secure": is_secure,
+                                "fingerprint": fingerprint})
+
+    def on_send_result(self, msg_id, status, error=None):
+        self.publish('delivery', {"id": msg_id, "status": status, "error": error})
+
+    def on_presence(self, status_text):
+        self.publish('presence', {"presence": status_text})
+
+    def on_rtt(self, rtt_ms):
+        self.publish('rtt', {"rtt_ms": rtt_ms})
+
+    # --- Commandes ---
+
+    def send_message(self, text):
+        """Met un message en file (comme queue_message) et l'annonce aux frontends."""
+        with self.lock:
+            # Sous le verrou : son "sent" (thread expéditeur) ne peut pas précéder l'annonce
+            msg_id = self.messenger.queue_message(text)
+            if not msg_id:
+                return None  # Refusé (trop long pour le transport) : rien à annoncer
+            self.publish('message', {"id": msg_id, "from": "Moi", "text": text,
+                                     "time": time.strftime("%H:%M:%S"), "delivery": "pending"})
+        return msg_id
+
+    def publish(self, kind, data):
+        """Met à jour l'état conservé et diffuse l'événement aux abonnés."""
+        with self.lock:
+            if kind == 'status':
+                self.session.update(data)
+            elif kind == 'presence':
+                self.session["presence"] = data["presence"]
+            elif kind == 'rtt':
+                self.session["rtt_ms"] = data["rtt_ms"]
+            elif kind == 'message':
+                self.history.append(dict(data))
+            elif kind == 'delivery':
+                for msg_obj in reversed(self.history):
+                    if msg_obj.get("id") == data["id"]:
+                        # Un "sent" tardif (redélivrance) ne doit pas masquer un "delivered"
+                        if msg_obj.get("delivery") != "delivered":
+                            msg_obj["delivery"] = data["status"]
+                        break
+            for client in list(self.subscribers):
+                client.push((kind, data))
+
+    def subscribe(self, client):
+        """Instantané puis flux : sous le verrou, aucun événement perdu ni doublé."""
+        with self.lock:
+            client.push(('snapshot', dict(self.session, messages=[dict(m) for m in self.history])))
+            self.subscribers.add(client)
+
+    def detach(self, client):
+        with self.lock:
+            self.subscribers.discard(client)
+            self.clients.discard(client)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except (OSError, AttributeError):
+                break
+            client = _IpcConnection(self, conn)
+            with self.lock:
+                self.clients.add(client)
+            client.start()
+
+
+class _IpcConnection:
+    """Un frontend rattaché : un thread lit ses commandes, un autre écrit ses événements."""
+
+    def __init__(self, server, conn):
+        self.server = server
+        self.conn = conn
+        self.events = queue.Queue(server.QUEUE_LIMIT)
+        self.write_lock = threading.Lock()  # Réponses (lecteur) et lots d'événements (écrivain)
+        self.closed = False
+
+    def start(self):
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def push(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            logging.warning("Frontend IPC trop lent : détaché.")
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.server.detach(self)
+        try:
+            self.events.put_nowait(None)  # Réveille l'écrivain
+        except queue.Full:
+            pass
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+    def _send(self, op, value):
+        with self.write_lock:
+            self.conn.sendall(pack_frame(op, value))
+
+    def _read_loop(self):
+        try:
+            while not self.closed:
+                frame = read_frame(self.conn)
+                if frame is None:
+                    break
+                self._handle(*frame)
+        except (OSError, ValueError, TypeError) as e:  # Trame ou requête malformée : on détache
+            if not self.closed:
+                logging.warning(f"Frontend IPC détaché : {e}")
+        self.close()
+
+    def _handle(self, op, value):
+        messenger = self.server.messenger
+        if op == OP_SUBSCRIBE:
+            self.server.subscribe(self)
+        elif op == OP_SEND:
+            req_id, text = _args(op, value, 2)
+            if not isinstance(text, str) or not text.strip():
+                self._send(OP_RESULT, [req_id, None, "Message vide"])
+            elif not messenger:
+                self._send(OP_RESULT, [req_id, None, "Aucune session"])
+            else:
+                msg_id = self.server.send_message(text.strip())
+                self._send(OP_RESULT, [req_id, msg_id, None if msg_id else "Message refusé"])
+        elif op == OP_PRESENCE:
+            if messenger and isinstance(value, str):
+                messenger.send_presence(value[:64])
+        elif op == OP_STATUS:
+            (req_id,) = _args(op, value, 1)
+            status = messenger.get_session_status() if messenger else None
+            self._send(OP_RESULT, [req_id, status, None])
+        elif op == OP_CONFIRM:
+            req_id, fingerprint = _args(op, value, 2)
+            confirmed = bool(messenger) and messenger.confirm_peer(fingerprint)
+            self._send(OP_RESULT, [req_id, confirmed, None])
+        elif op == OP_CLOSE:
+            if messenger:
+                messenger.close()
+        else:
+            logging.warning(f"Opcode IPC inconnu : {op:#x}")
+
+    def _write_loop(self):
+        """Envoie en une trame tout ce qui s'est accumulé pendant l'envoi précédent."""
+        while not self.closed:
+            event = self.events.get()
+            batch = []
+            while event is not None:
+                batch.append(event)
+                if len(batch) >= self.server.BATCH_MAX:
+                    break
+                try:
+                    event = self.events.get_nowait()
+                except queue.Empty:
+                    event = None
+            if batch:
+                try:
+                    self._send(OP_EVENTS, batch)
+                except OSError:
+                    break
+        self.close()
+
+
+def _args(op, value, count):
+    """Arguments d'une requête [req_id, ...] : ValueError si la forme est invalide."""
+    if not isinstance(value, list) or len(value) != count:
+        raise ValueError(f"Requête IPC malformée (opcode {op:#x}) : {value!r:.40}")
+    return value
@@ -3,6 +3,8 @@ import threading
 import struct
 import logging
 
+from diagnostics.profiler import CAPTURE
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - [NETWORK] - %(message)s')
 
@@ -14,7 +16,10 @@ class NetworkManager:
       évitant les problèmes de collage/découpage de paquets TCP.
     """
 
-    def __init__(self, on_receive_callback=None, on_disconnect_callback=None):
+    RELIABLE = True  # Flux ordonné et fiable : pas de retransmission côté protocole
+    MAX_FRAME = 0xFFFFFFFF  # Préfixe de longueur sur 4 octets
+
+    def __init__(self, on_receive_callback=None, on_disconnect_callback=None, dead_peer_timeout=None):
         self.sock = None        # Socket principal
         self.conn = None        # Socket de connexion active (pour envoyer/recevoir)
         self.address = None     # Adresse du pair
@@ -23,9 +28,15 @@ class NetworkManager:
         self.on_receive = on_receive_callback
         self.on_disconnect = on_disconnect_callback
         self.receive_thread = None
+        self.send_lock = threading.Lock()  # sendall depuis plusieurs threads (handshake, outbox)
+        self.dead_peer_timeout = dead_peer_timeout  # Secondes (None = défauts du noyau)
 
     def start_server(self, port, host='0.0.0.0'):
         """Démarre le socket serveur et attend UNE connexion."""
+        return self.listen(port, host) and self.accept_peer()
+
+    def listen(self, port, host='0.0.0.0'):
+        """Ouvre le socket d'écoute sans bloquer (le pair peut se connecter dès maintenant)."""
         try:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Permet de redémarrer rapidement
@@ -33,22 +44,40 @@ class NetworkManager:
             self.sock.listen(1)
             self.is_server = True
             logging.info(f"Serveur en écoute sur {host}:{port}")
-            
+            return True
+        except Exception as e:
+            logging.error(f"Erreur démarrage serveur: {e}")
+            return False
+
+    def accept_peer(self):
+        """Attend UNE connexion sur le socket ouvert par listen()."""
+        try:
             # Bloquant jusqu'à connexion (pour simplifier le flux)
             self.conn, self.address = self.sock.accept()
             logging.info(f"Connexion entrante acceptée de {self.address}")
+            self._configure_keepalive(self.conn)
             
             self.running = True
             self._start_receive_thread()
             return True
         except Exception as e:
-            logging.error(f"Erreur démarrage serveur: {e}")
+            logging.error(f"Erreur acceptation connexion: {e}")
             return False
 
+    def attach(self, conn, address):
+        """Prend en charge une connexion déjà acceptée ailleurs (serveur multi-processus)."""
+        self.conn, self.address = conn, address
+        self._configure_keepalive(conn)
+        self.is_server = True
+        self.running = True
+        self._start_receive_thread()
+        return True
+
     def connect_to_peer(self, ip, port):
         """Connecte ce client à un pair distant."""
         try:
             self.conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._configure_keepalive(self.conn)
             self.conn.connect((ip, port))
             self.address = (ip, port)
             self.is_server = False
@@ -61,16 +90,46 @@ class NetworkManager:
             logging.error(f"Erreur connexion vers {ip}:{port} : {e}")
             return False
 
+    def _configure_keepalive(self, conn):
+        """
+        Détection noyau d'un pair disparu sans FIN (câble, mise en veille) :
+        - keepalive TCP : sondes après `dead_peer_timeout / 3` s d'inactivité ;
+        - TCP_USER_TIMEOUT (Linux) : échec d'un envoi resté non acquitté trop
+          longtemps, au lieu de ~15 min de retransmissions.
+        Les heartbeats chiffrés de SecureMessenger couvrent les autres systèmes.
+        """
+        if not self.dead_peer_timeout:
+            return
+        timeout = self.dead_peer_timeout
+        options = [
+            (socket.SOL_SOCKET, 'SO_KEEPALIVE', 1),
+            (socket.IPPROTO_TCP, 'TCP_KEEPIDLE', max(1, int(timeout / 3))),
+            (socket.IPPROTO_TCP, 'TCP_KEEPINTVL', max(1, int(timeout / 6))),
+            (socket.IPPROTO_TCP, 'TCP_KEEPCNT', 3),
+            (socket.IPPROTO_TCP, 'TCP_USER_TIMEOUT', int(timeout * 1000)),
+        ]
+        for level, name, value in options:
+            if hasattr(socket, name):  # Options absentes selon l'OS (macOS, Windows)
+                try:
+                    conn.setsockopt(level, getattr(socket, name), value)
+                except OSError as e:
+                    logging.warning(f"Option {name} refusée: {e}")
+
     def send_bytes(self, data: bytes):
         """Envoie des données brutes avec un header de longueur."""
+        return self.send_many([data])
+
+    def send_many(self, frames):
+        """Envoie plusieurs messages en un seul appel système (envoi en lot)."""
         if not self.conn or not self.running:
             logging.error("Tentative d'envoi sans connexion active.")
             return False
 
         try:
-            # Framing: [Length (4B)][Data]
-            header = struct.pack('!I', len(data))
-            self.conn.sendall(header + data)
+            # Framing: [Length (4B)][Data] pour chaque message
+            data = b"".join(struct.pack('!I', len(frame)) + frame for frame in frames)
+            with self.send_lock:
+                self.conn.sendall(data)
             return True
         except Exception as e:
             logging.error(f"Erreur d'envoi: {e}")
@@ -121,7 +180,10 @@ class NetworkManager:
                             # Callback
                             if self.on_receive:
                                 try:
-                                    self.on_receive(payload)
+                                    if CAPTURE.active:  # Capture de profilage à la demande
+                                        CAPTURE.run('receive', self.on_receive, payload)
+                                    else:
+                                        self.on_receive(payload)
                                 except Exception as e:
                                     logging.error(f"Erreur dans le callback on_receive: {e}")
                         else:
@@ -138,6 +200,12 @@ class NetworkManager:
         """Ferme la connexion proprement."""
         self.running = False
         if self.conn:
+            try:
+                # shutdown() envoie le FIN tout de suite, même si un autre thread
+                # est bloqué dans recv() sur ce socket (close() seul ne le fait pas)
+                self.conn.shutdown(socket.SHUT_RDWR)
+            except:
+                pass
             try:
                 self.conn.close()
             except:
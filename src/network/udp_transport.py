@@ -0,0 +1,179 @@
+import socket
+import threading
+import logging
+
+class UdpNetworkManager:
+    """
+    Transport datagramme (UDP), même interface que NetworkManager.
+    - Un datagramme = un paquet protocole : pas de framing, pas de blocage en tête
+      de file (un datagramme perdu ne retarde pas les suivants).
+    - Aucune garantie de livraison ni d'ordre : la fiabilité (ACK sélectifs,
+      retransmission) est assurée au-dessus, par SecureMessenger.
+    - Mode serveur : le premier datagramme reçu fixe l'adresse du pair.
+    """
+
+    RELIABLE = False     # Perte / désordre possibles : le protocole retransmet
+    MAX_DATAGRAM = 65507 # Charge utile UDP maximale (IPv4), taille du tampon de réception
+    # Un paquet du protocole par datagramme, sans fragmentation IP : au-delà du MTU,
+    # la perte d'un seul fragment perd tout le paquet (et chaque retransmission).
+    # 1200 octets passent sur tout chemin (MTU IPv6 minimale 1280 - en-têtes), comme QUIC.
+    MAX_FRAME = 1200
+
+    def __init__(self, on_receive_callback=None, on_disconnect_callback=None, dead_peer_timeout=None):
+        self.sock = None        # Socket UDP (connecté au pair une fois connu)
+        self.address = None     # Adresse du pair
+        self.is_server = False
+        self.running = False
+        self.on_receive = on_receive_callback
+        self.on_disconnect = on_disconnect_callback
+        self.receive_thread = None
+        self._first_datagram = None  # Reçu par accept_peer(), traité par le thread RX
+        # Pas de keepalive en UDP : seuls les heartbeats du protocole détectent un pair disparu
+        self.dead_peer_timeout = dead_peer_timeout
+
+    @property
+    def conn(self):
+        # Compatibilité avec NetworkManager (tests de connexion active)
+        return self.sock if self.address else None
+
+    def start_server(self, port, host='0.0.0.0'):
+        """Ouvre le port et attend le premier datagramme d'un pair."""
+        return self.listen(port, host) and self.accept_peer()
+
+    def listen(self, port, host='0.0.0.0'):
+        """Ouvre le socket UDP sans bloquer."""
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # Pas de SO_REUSEADDR : en UDP, il laisserait un second processus
+            # partager (ou détourner) le port au lieu d'échouer au bind()
+            self.sock.bind((host, port))
+            self.is_server = True
+            logging.info(f"Serveur UDP en écoute sur {host}:{port}")
+            return True
+        except Exception as e:
+            logging.error(f"Erreur démarrage serveur UDP: {e}")
+            if self.sock:
+                self.sock.close()
+                self.sock = None
+            return False
+
+    def accept_peer(self):
+        """Bloque jusqu'au premier datagramme, puis se lie à son expéditeur."""
+        try:
+            # Attente par tranches : close() depuis un autre thread interrompt l'attente
+            self.sock.settimeout(0.5)
+            while True:
+                try:
+                    data, self.address = self.sock.recvfrom(self.MAX_DATAGRAM)
+                    break
+                except socket.timeout:
+                    continue
+            self.sock.settimeout(None)
+            # connect() filtre ensuite les datagrammes des autres adresses
+            self.sock.connect(self.address)
+            logging.info(f"Pair UDP : {self.address}")
+
+            self._first_datagram = data
+            self.running = True
+            self._start_receive_thread()
+            return True
+        except Exception as e:
+            logging.error(f"Erreur attente pair UDP: {e}")
+            return False
+
+    def connect_to_peer(self, ip, port):
+        """Associe le socket au pair (aucun échange réseau en UDP)."""
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect((ip, port))
+            self.address = (ip, port)
+            self.is_server = False
+            logging.info(f"Socket UDP associé à {ip}:{port}")
+
+            self.running = True
+            self._start_receive_thread()
+            return True
+        except Exception as e:
+            logging.error(f"Erreur association UDP vers {ip}:{port} : {e}")
+            return False
+
+    def send_bytes(self, data: bytes):
+        """Envoie un datagramme (sans garantie de livraison)."""
+        return self.send_many([data])
+
+    def send_many(self, frames):
+        """Envoie chaque paquet dans son propre datagramme."""
+        if not self.sock or not self.running or not self.address:
+            logging.error("Tentative d'envoi sans pair UDP.")
+            return False
+
+        try:
+            for frame in frames:
+                if len(frame) > self.MAX_FRAME:
+                    raise ValueError(f"Paquet trop grand pour UDP ({len(frame)} octets)")
+                self.sock.send(frame)
+            return True
+        except OSError as e:
+            # Perte locale (buffer plein, ICMP) : la retransmission s'en charge
+            logging.warning(f"Erreur d'envoi UDP: {e}")
+            return False
+        except Exception as e:
+            logging.error(f"Erreur d'envoi UDP: {e}")
+            return False
+
+    def _start_receive_thread(self):
+        """Lance le thread de réception."""
+        self.receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self.receive_thread.start()
+
+    def _receive_loop(self):
+        """Chaque datagramme est remis tel quel au callback."""
+        logging.info("Démarrage de la boucle de réception UDP.")
+
+        if self._first_datagram is not None:
+            self._deliver(self._first_datagram)
+            self._first_datagram = None
+
+        while self.running and self.sock:
+            try:
+                data = self.sock.recv(self.MAX_DATAGRAM)
+            except ConnectionRefusedError:
+                # ICMP "port unreachable" : le pair n'écoute pas (encore). On continue.
+                continue
+            except Exception as e:
+                if self.running:
+                    logging.error(f"Erreur réception UDP: {e}")
+                break
+            self._deliver(data)
+
+        self.close()
+
+    def _deliver(self, data):
+        if self.on_receive:
+            try:
+                self.on_receive(data)
+            except Exception as e:
+                logging.error(f"Erreur dans le callback on_receive: {e}")
+
+    def close(self):
+        """Ferme le socket (idempotent)."""
+        # Détacher le socket d'abord : close() peut être appelé par deux threads
+        sock, self.sock = self.sock, None
+        was_running = self.running or sock is not None
+        self.running = False
+        if sock:
+            try:
+                # Débloque recv() dans le thread de réception
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+        if not was_running:
+            return
+        logging.info("Transport UDP fermé.")
+        if self.on_disconnect:
+            self.on_disconnect()
@@ -0,0 +1,111 @@
+import time
+import uuid
+import queue
+import logging
+import threading
+
+class Outbox:
+    """
+    File d'envoi asynchrone (boîte d'envoi).
+    - enqueue() retourne immédiatement un identifiant de message, sans I/O réseau.
+    - Un thread expéditeur dédié vide la file : chiffrement + envoi bloquant.
+    - Le résultat (envoyé / échec) est remonté via le callback on_result.
+    - submit() exécute une tâche quelconque sur ce même thread (ACK, redélivrance),
+      ce qui garde un seul écrivain réseau.
+    - on_tick (optionnel) est appelé toutes les `tick_interval` secondes sur ce
+      thread : timers de retransmission sans thread supplémentaire.
+    Un pair lent ne bloque donc que ce thread, jamais l'appelant.
+    """
+
+    _STOP = object()  # Sentinelle d'arrêt du thread
+
+    def __init__(self, send_func, on_result=None, on_tick=None, tick_interval=0.1):
+        self.send_func = send_func  # (msg_id, text) -> bool
+        self.on_result = on_result  # (msg_id, success, error)
+        self.on_tick = on_tick
+        self.tick_interval = tick_interval
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def start(self):
+        """Lance le thread expéditeur (idempotent)."""
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def enqueue(self, text, msg_id=None):
+        """Met un message en file et retourne son identifiant."""
+        msg_id = msg_id or uuid.uuid4().hex
+        self.start()
+        self.queue.put((msg_id, text))
+        return msg_id
+
+    def submit(self, job):
+        """Exécute `job()` sur le thread expéditeur (ignoré après stop())."""
+        self.start()
+        self.queue.put(job)
+
+    def stop(self):
+        """Arrête le thread ; les messages restants sont signalés en échec."""
+        self.stopped.set()
+        self.queue.put(self._STOP)
+
+    def _run(self):
+        """Boucle du thread expéditeur."""
+        next_tick = time.monotonic() + self.tick_interval
+        while True:
+            try:
+                timeout = max(0.0, next_tick - time.monotonic()) if self.on_tick else None
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if self.on_tick and time.monotonic() >= next_tick:
+                next_tick = time.monotonic() + self.tick_interval
+                if not self.stopped.is_set():
+                    try:
+                        self.on_tick()
+                    except Exception as e:
+                        logging.error(f"Erreur timer d'envoi: {e}")
+
+            if item is None:
+                continue
+            if item is self._STOP:
+                break
+            if callable(item):
+                if not self.stopped.is_set():
+                    try:
+                        item()
+                    except Exception as e:
+                        logging.error(f"Erreur tâche d'envoi: {e}")
+                continue
+            msg_id, text = item
+            if self.stopped.is_set():
+                self._notify(msg_id, False, "Déconnecté")
+                continue
+            try:
+                ok = self.send_func(msg_id, text)
+                self._notify(msg_id, ok, None if ok else "Erreur d'envoi")
+            except Exception as e:
+                logging.error(f"Erreur envoi différé {msg_id}: {e}")
+                self._notify(msg_id, False, str(e))
+
+        # Vider la file : ces messages ne partiront jamais
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP and not callable(item):
+                self._notify(item[0], False, "Déconnecté")
+
+    def _notify(self, msg_id, success, error):
+        if self.on_result:
+            try:
+                self.on_result(msg_id, success, error)
+            except Exception as e:
+                logging.error(f"Erreur dans le callback on_result: {e}")
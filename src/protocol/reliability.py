@@ -0,0 +1,152 @@
+import os
+import time
+import sqlite3
+import threading
+
+class ReplayWindow:
+    """
+    Fenêtre glissante anti-rejeu (même principe qu'IPsec ESP / DTLS).
+    - `highest` : plus grand numéro de séquence accepté.
+    - `bitmap`  : bit i à 1 <=> le numéro (highest - i) a déjà été reçu.
+    - `cumulative` : plus grand numéro tel que TOUS les précédents sont reçus
+      (valeur renvoyée au pair dans les ACK cumulatifs).
+    Les numéros commencent à 1 ; 0 signifie "rien reçu".
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self.highest = 0
+        self.bitmap = 0
+        self.cumulative = 0
+
+    def check(self, seq):
+        """Vrai si `seq` est acceptable (ni rejoué, ni trop ancien). Ne modifie rien."""
+        if seq <= 0:
+            return False
+        if seq > self.highest:
+            return True
+        offset = self.highest - seq
+        if offset >= self.size:
+            return False  # Trop ancien : hors fenêtre
+        return not (self.bitmap >> offset) & 1
+
+    def update(self, seq):
+        """Marque `seq` comme reçu. À appeler APRÈS vérification du tag AEAD."""
+        if seq > self.highest:
+            shift = seq - self.highest
+            self.bitmap = ((self.bitmap << shift) | 1) & ((1 << self.size) - 1)
+            self.highest = seq
+        else:
+            self.bitmap |= 1 << (self.highest - seq)
+
+        # Faire avancer l'ACK cumulatif tant que la suite est contiguë
+        while self.cumulative < self.highest and self._seen(self.cumulative + 1):
+            self.cumulative += 1
+
+    def selective_acks(self, count=64):
+        """Bitmap SACK : bit i à 1 <=> (cumulative + 1 + i) reçu (trous au-delà du cumul)."""
+        bits = 0
+        for i in range(min(count, self.highest - self.cumulative)):
+            if self._seen(self.cumulative + 1 + i):
+                bits |= 1 << i
+        return bits
+
+    def _seen(self, seq):
+        offset = self.highest - seq
+        return 0 <= offset < self.size and (self.bitmap >> offset) & 1 == 1
+
+
+class MessageStore:
+    """
+    File store-and-forward persistante (SQLite).
+    - Table `outbox`   : messages sortants non encore acquittés par le pair,
+      rattachés au pair destinataire (`peer`, NULL tant qu'aucun n'est choisi).
+    - Table `received` : identifiants déjà reçus (dédoublonnage des redélivrances).
+    path=None => base en mémoire (pas de persistance entre redémarrages).
+
+    Attention : les messages en attente sont stockés EN CLAIR sur le disque
+    (les clés de session sont éphémères) ; le fichier est créé en mode 0600.
+    """
+
+    RECEIVED_HISTORY = 1000  # Nombre d'identifiants reçus conservés
+
+    def __init__(self, path=None):
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            if not os.path.exists(path):
+                # Créer le fichier lisible par le seul propriétaire
+                os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self.db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "msg_id TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL, peer TEXT)"
+            )
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(outbox)")]
+            if 'peer' not in columns:  # Base créée par une version précédente
+                self.db.execute("ALTER TABLE outbox ADD COLUMN peer TEXT")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS received ("
+                "msg_id TEXT PRIMARY KEY, ts REAL NOT NULL)"
+            )
+
+    def add(self, msg_id, text, peer=None):
+        """Enregistre un message sortant avant toute tentative d'envoi."""
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR IGNORE INTO outbox (msg_id, text, created, peer) VALUES (?, ?, ?, ?)",
+                (msg_id, text, time.time(), peer)
+            )
+
+    def bind(self, msg_ids, peer):
+        """Rattache à `peer` les messages encore sans destinataire (première émission)."""
+        if not msg_ids:
+            return
+        with self.lock, self.db:
+            self.db.executemany("UPDATE outbox SET peer = ? WHERE msg_id = ? AND peer IS NULL",
+                                [(peer, m) for m in msg_ids])
+
+    def remove(self, msg_ids):
+        """Supprime les messages acquittés par le pair."""
+        if not msg_ids:
+            return
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM outbox WHERE msg_id = ?", [(m,) for m in msg_ids])
+
+    def pending(self, peer=None):
+        """
+        Messages non acquittés, dans l'ordre d'envoi : [(msg_id, text), ...].
+        Avec `peer` : seulement ceux destinés à ce pair ou sans destinataire.
+        """
+        with self.lock:
+            if peer is None:
+                return self.db.execute(
+                    "SELECT msg_id, text FROM outbox ORDER BY created, rowid"
+                ).fetchall()
+            return self.db.execute(
+                "SELECT msg_id, text FROM outbox WHERE peer IS NULL OR peer = ? "
+                "ORDER BY created, rowid", (peer,)
+            ).fetchall()
+
+    def mark_received(self, msg_id):
+        """Retourne True si le message est nouveau, False si c'est un doublon."""
+        with self.lock, self.db:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO received (msg_id, ts) VALUES (?, ?)",
+                (msg_id, time.time())
+            )
+            if cursor.rowcount == 0:
+                return False
+            # Purge périodique (pas à chaque insertion) des plus anciens
+            if cursor.lastrowid % 100 == 0:
+                self.db.execute(
+                    "DELETE FROM received WHERE rowid <= ?",
+                    (cursor.lastrowid - self.RECEIVED_HISTORY,)
+                )
+            return True
+
+    def close(self):
+        with self.lock:
+            self.db.close()
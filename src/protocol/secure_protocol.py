@@ -1,31 +1,90 @@
+import time
+import uuid
+import struct
 import logging
 import threading
 from enum import Enum
-from cryptography.hazmat.primitives import serialization
 
 # Imports des couches inférieures
 from network.network_layer import NetworkManager
+from network.udp_transport import UdpNetworkManager
 from crypto.crypto_manager import CryptoManager
+from protocol.outbox import Outbox
+from protocol.reliability import ReplayWindow, MessageStore
+from diagnostics.profiler import CAPTURE
 
 class ProtocolState(Enum):
     IDLE = 0
     HANDSHAKING = 1
     SECURE = 2
 
+# Transports sélectionnables (paramètre `transport` de SecureMessenger)
+TRANSPORTS = {
+    'tcp': NetworkManager,
+    'udp': UdpNetworkManager,
+}
+
 class SecureMessenger:
     """
     Orchestrateur de la sécurité.
     Gère le cycle de vie : Connection -> Handshake (ECDH) -> Secure Transport.
+    Fiabilité : numéros de séquence par direction (fenêtre anti-rejeu), ACK
+    cumulatifs et file store-and-forward redélivrée en lots après reconnexion.
+    Les messages en attente restent rattachés à leur pair (adresse IP) et ne sont
+    redélivrés qu'après confirmation du SAS par l'utilisateur (confirm_peer) :
+    un homme du milieu ne reçoit jamais l'arriéré d'une session précédente.
+    Sur transport datagramme (UDP), chaque paquet se déchiffre seul (nonce et
+    séquence explicites) ; les messages sont retransmis sélectivement (SACK) et
+    la présence est envoyée sans garantie (fire-and-forget).
+    Vivacité : heartbeats chiffrés (ping/pong) qui mesurent le RTT ; sans aucun
+    paquet authentique du pair pendant `heartbeat_timeout`, la session est fermée ;
+    sans clé du pair `HANDSHAKE_TIMEOUT` secondes après l'envoi de la nôtre, la
+    connexion est abandonnée (statut "Erreur ...").
     """
     
     # Types de paquets (1 byte prefix)
     TYPE_HANDSHAKE = b'\x01'
     TYPE_MESSAGE   = b'\x02'
+    TYPE_ACK       = b'\x03'
+    TYPE_PRESENCE  = b'\x04'
+    TYPE_HEARTBEAT = b'\x05'
+
+    # En-têtes en clair mais authentifiés (AAD GCM), placés après le type
+    MESSAGE_HEADER  = struct.Struct('!Q16s')  # [Seq 8B][MsgId 16B]
+    ACK_HEADER      = struct.Struct('!QQ')    # [ACK cumulatif 8B][SACK bitmap 8B]
+    PRESENCE_HEADER = struct.Struct('!Q')     # [Seq présence 8B]
+    HEARTBEAT_HEADER = struct.Struct('!BQ')   # [Type + rôle 1B][Seq ping 8B]
+    MESSAGE_OVERHEAD = 1 + MESSAGE_HEADER.size + 12 + 16  # Type, en-tête, nonce, tag GCM
+
+    HEARTBEAT_PING = 0x00
+    HEARTBEAT_PONG = 0x01
+    HEARTBEAT_FROM_SERVER = 0x80  # Bit de rôle : un heartbeat réfléchi vers son émetteur est rejeté
+
+    REDELIVERY_BATCH = 32       # Messages par appel système lors de la redélivrance
+    SEND_WINDOW = 64            # Écart max de séquences non acquittées (= fenêtre anti-rejeu)
+    RETRANSMIT_TIMEOUT = 0.25   # Secondes avant retransmission (transport datagramme)
+    TICK_INTERVAL = 0.1         # Période des timers du thread expéditeur
+    HEARTBEAT_INTERVAL = 2.0    # Secondes entre deux pings (0 = désactivé)
+    HEARTBEAT_TIMEOUT = 6.0     # Silence du pair au-delà duquel la session est fermée
+    HANDSHAKE_TIMEOUT = 10.0    # Clé du pair attendue au plus tant après l'envoi de la nôtre
 
-    def __init__(self, on_message_received, on_status_change):
-        self.net = NetworkManager(
+    def __init__(self, on_message_received, on_status_change, on_send_result=None, store=None,
+                 transport='tcp', on_presence=None, on_rtt=None,
+                 heartbeat_interval=None, heartbeat_timeout=None):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Transport inconnu : {transport} (choix : {', '.join(TRANSPORTS)})")
+        self.heartbeat_interval = (self.HEARTBEAT_INTERVAL if heartbeat_interval is None
+                                   else heartbeat_interval)
+        self.heartbeat_timeout = (self.HEARTBEAT_TIMEOUT if heartbeat_timeout is None
+                                  else heartbeat_timeout)
+        if self.heartbeat_interval and self.heartbeat_timeout <= self.heartbeat_interval:
+            raise ValueError("heartbeat_timeout doit dépasser heartbeat_interval")
+        self.transport = transport
+        self.max_message_bytes = TRANSPORTS[transport].MAX_FRAME - self.MESSAGE_OVERHEAD
+        self.net = TRANSPORTS[transport](
             on_receive_callback=self._handle_network_data,
-            on_disconnect_callback=self._on_disconnect
+            on_disconnect_callback=self._on_disconnect,
+            dead_peer_timeout=self.heartbeat_timeout if self.heartbeat_interval else None
         )
         self.crypto = CryptoManager()
         self.state = ProtocolState.IDLE
@@ -33,60 +92,150 @@ class SecureMessenger:
         # Callbacks vers l'UI
         self.on_message_received = on_message_received
         self.on_status_change = on_status_change # (status_msg, is_secure, fingerprint)
+        self.on_send_result = on_send_result     # (msg_id, status, error) status: sent/delivered/queued
+        self.on_presence = on_presence           # (status_text) présence du pair
+        self.on_rtt = on_rtt                     # (rtt_ms) RTT lissé, à chaque pong
 
-    def start_server(self, port):
+        # Envoi asynchrone : le thread expéditeur fait le chiffrement et l'I/O bloquante
+        self.outbox = Outbox(self._send_queued, self._on_outbox_result,
+                             on_tick=self._on_tick, tick_interval=self.TICK_INTERVAL)
+
+        # File store-and-forward : partagée entre sessions successives par l'appelant
+        self.store = store if store is not None else MessageStore()
+        self.tx_lock = threading.Lock()      # Ordre seq / écriture réseau
+        self.flight_lock = threading.Lock()  # Accès à in_flight (thread de réception)
+        self._my_pub_pem = None
+        self._peer_pub_pem = None
+        self._handshake_sent_at = 0.0
+        self._handshake_started_at = 0.0      # Premier envoi de notre clé (échéance du handshake)
+        self.srtt = None                     # RTT lissé (s), mesuré par les heartbeats
+        self._key_lock = threading.Lock()    # Premier envoi de notre clé publique
+        self._session_lock = threading.Lock() # Nouvelle session / confirmation du SAS
+        self.fingerprint = None              # SAS de la session courante
+        self._reset_session()
+
+    def start_server(self, port, host='0.0.0.0'):
         """Démarre en mode serveur (attente)."""
+        # Le port est ouvert AVANT la génération des clés : le nœud est joignable
+        # immédiatement, un pair qui se connecte pendant ce temps attend dans le backlog.
+        if not self.net.listen(port, host):
+            self._set_status("Erreur démarrage serveur", False)
+            return
         self._set_status("En attente de connexion...", False)
+
         # Générer les clés AVANT d'accepter la connexion pour être prêt
-        self._set_status("Génération des clés ECDH...", False)
-        try:
-            self.crypto.generate_ephemeral_keys()
-        except Exception as e:
-            logging.error(f"Erreur génération clés: {e}")
-            self._set_status("Erreur cryptographique", False)
+        if not self._prepare_keys():
+            self.net.close()
             return
         
         # Maintenant accepter la connexion
-        if self.net.start_server(port):
+        if self.net.accept_peer():
             # Connexion établie, envoyer notre clé publique
-            try:
-                my_pub_pem = self.crypto.public_key.public_bytes(
-                    encoding=serialization.Encoding.PEM,
-                    format=serialization.PublicFormat.SubjectPublicKeyInfo
-                )
-                self.state = ProtocolState.HANDSHAKING
-                self.net.send_bytes(self.TYPE_HANDSHAKE + my_pub_pem)
-                self._set_status("Clé publique envoyée. Attente du pair...", False)
-            except Exception as e:
-                logging.error(f"Erreur envoi clé: {e}")
-                self.close()
+            self.outbox.start()
+            self._send_first_public_key()
         else:
             self._set_status("Erreur démarrage serveur", False)
 
     def connect(self, ip, port):
         """Démarre en mode client (connexion)."""
         self._set_status(f"Connexion vers {ip}:{port}...", False)
+        # Générer les clés AVANT de se connecter : la clé du serveur peut arriver
+        # dès l'établissement de la connexion.
+        if not self._prepare_keys():
+            return
+
         if self.net.connect_to_peer(ip, port):
-            self._start_handshake()
+            self.outbox.start()
+            self._send_first_public_key()
         else:
             self._set_status("Erreur de connexion", False)
 
+    def accept_connection(self, conn, address):
+        """Mode serveur sur une connexion TCP déjà acceptée (voir ShardedServer)."""
+        if not self._prepare_keys():
+            conn.close()
+            return
+        self.net.attach(conn, address)
+        self.outbox.start()
+        self._send_first_public_key()
+
     def send_message(self, text):
-        """Envoie un message texte (uniquement si sécurisé)."""
+        """Envoie un message texte (uniquement si sécurisé). Bloquant."""
         if self.state != ProtocolState.SECURE:
             logging.warning("Tentative d'envoi hors session sécurisée.")
             return False
-        
+        if not self._fits(text):
+            return False
+
+        msg_id = uuid.uuid4().hex
         try:
-            encrypted_blob = self.crypto.encrypt_message(text)
-            # Packet: [TYPE_MESSAGE][EncryptedBlob]
-            self.net.send_bytes(self.TYPE_MESSAGE + encrypted_blob)
-            return True
+            self.store.add(msg_id, text, self._peer_id())
+            self.session_ids.add(msg_id)
+            return self._transmit(msg_id, text)
         except Exception as e:
             logging.error(f"Erreur chiffrement/envoi: {e}")
             return False
 
+    def queue_message(self, text):
+        """
+        Enregistre un message dans la file store-and-forward, le met en file d'envoi
+        et retourne son identifiant immédiatement. Hors session sécurisée, il sera
+        redélivré au prochain pair dont le SAS est confirmé. Les étapes arrivent
+        via on_send_result. Retourne None (rien n'est stocké) si le message
+        chiffré ne tient pas dans une trame du transport.
+        """
+        if not self._fits(text):
+            return None
+        msg_id = uuid.uuid4().hex
+        session_ids = self.session_ids  # Lu avant l'état : un handshake concurrent le remplace
+        if self.state == ProtocolState.SECURE:
+            self.store.add(msg_id, text, self._peer_id())
+            session_ids.add(msg_id)
+        else:
+            self.store.add(msg_id, text)
+        return self.outbox.enqueue(text, msg_id)
+
+    def confirm_peer(self, fingerprint=None):
+        """
+        L'utilisateur a vérifié le SAS avec son correspondant : les messages en
+        attente pour ce pair (ou sans destinataire) lui sont redélivrés.
+        `fingerprint` : SAS comparé par l'utilisateur ; refusé s'il n'est pas
+        celui de la session courante (nouvelle session entre-temps).
+        """
+        with self._session_lock:
+            if self.state != ProtocolState.SECURE:
+                return False
+            if fingerprint is not None and fingerprint != self.fingerprint:
+                return False
+            self.peer_confirmed = True
+        logging.info("SAS confirmé : redélivrance des messages en attente.")
+        self.outbox.submit(self._redeliver_pending)
+        return True
+
+    def send_presence(self, status_text):
+        """
+        Envoie un statut de présence (en ligne, absent...) sans garantie de
+        livraison : ni ACK, ni retransmission, ni stockage. Non bloquant.
+        """
+        if self.state != ProtocolState.SECURE:
+            return False
+        self.outbox.submit(lambda: self._transmit_presence(status_text))
+        return True
+
+    def get_session_status(self):
+        """État de la session pour l'UI : transport, pair, RTT, dernier signe de vie."""
+        secure = self.state == ProtocolState.SECURE
+        return {
+            "state": self.state.name.lower(),
+            "transport": self.transport,
+            "peer": f"{self.net.address[0]}:{self.net.address[1]}" if self.net.address else None,
+            "rtt_ms": round(self.srtt * 1000, 1) if self.srtt is not None else None,
+            "peer_confirmed": secure and self.peer_confirmed,
+            "last_seen_s": round(time.monotonic() - self.last_seen, 1) if secure else None,
+        }
+
     def close(self):
+        self.outbox.stop()
         self.net.close()
         self.state = ProtocolState.IDLE
 
@@ -96,21 +245,257 @@ class SecureMessenger:
         if self.on_status_change:
             self.on_status_change(msg, is_secure, fingerprint)
 
-    def _start_handshake(self):
-        """Initie le handshake : génère clés et envoie la PubKey."""
-        self.state = ProtocolState.HANDSHAKING
+    def _prepare_keys(self):
+        """Génère la paire ECDH éphémère et passe en HANDSHAKING."""
         self._set_status("Génération des clés ECDH...", False)
-        
         try:
-            my_pub_pem = self.crypto.generate_ephemeral_keys()
+            self._my_pub_pem = self.crypto.generate_ephemeral_keys()
+        except Exception as e:
+            logging.error(f"Erreur génération clés: {e}")
+            self._set_status("Erreur cryptographique", False)
+            return False
+        self.state = ProtocolState.HANDSHAKING
+        return True
+
+    def _notify_send_result(self, msg_id, status, error=None):
+        if self.on_send_result:
+            self.on_send_result(msg_id, status, error)
+
+    def _reset_session(self):
+        """État de fiabilité propre à une session (une clé de session)."""
+        self.tx_seq = 0                     # Dernier numéro de séquence émis
+        self.in_flight = {}                 # seq -> [msg_id, trame, instant d'envoi], non acquittés
+        self.sent_ids = set()               # msg_id déjà émis dans cette session
+        self.acked = 0                      # Dernier ACK cumulatif reçu
+        self.replay_window = ReplayWindow(self.SEND_WINDOW) # Numéros reçus du pair
+        self.presence_seq = 0               # Séquence indépendante : une présence perdue
+        self.presence_window = ReplayWindow() # ne bloque pas l'ACK cumulatif des messages
+        self._ack_scheduled = False
+        self._backlog = False               # Messages retenus faute de fenêtre d'envoi
+        self.heartbeat_seq = 0              # Dernier ping émis
+        self.heartbeat_window = ReplayWindow() # Pings reçus du pair
+        self.pending_pings = {}             # seq -> instant d'envoi, en attente de pong
+        self.last_seen = time.monotonic()   # Dernier paquet authentique du pair
+        self._last_ping = 0.0
+        self.session_ids = set()            # msg_id écrits pendant cette session
+        self.peer_confirmed = False         # SAS confirmé par l'utilisateur (confirm_peer)
+
+    def _fits(self, text):
+        """Vrai si le message chiffré tient dans une trame (un datagramme en UDP)."""
+        # Au plus 4 octets UTF-8 par caractère : l'encodage n'est fait que près de la limite
+        if len(text) * 4 <= self.max_message_bytes or \
+                len(text.encode('utf-8')) <= self.max_message_bytes:
+            return True
+        logging.warning(f"Message refusé : plus de {self.max_message_bytes} octets "
+                        f"(transport {self.transport}).")
+        return False
+
+    def _peer_id(self):
+        """Destinataire des messages en attente : adresse IP du pair."""
+        return self.net.address[0] if self.net.address else None
+
+    # -- Émission (thread expéditeur, ou appelant de send_message) --
+
+    def _send_queued(self, msg_id, text):
+        """Appelé par le thread expéditeur de l'outbox."""
+        if self.state != ProtocolState.SECURE:
+            return False  # Reste en file store-and-forward
+        if msg_id not in self.session_ids and not self.peer_confirmed:
+            return False  # Écrit avant cette session : attend la confirmation du SAS
+        if CAPTURE.active:  # Capture de profilage à la demande (sinon un seul test d'attribut)
+            return CAPTURE.run('send', self._transmit, msg_id, text)
+        return self._transmit(msg_id, text)
+
+    def _on_outbox_result(self, msg_id, success, error):
+        # Un échec n'est pas définitif : le message reste dans le store
+        self._notify_send_result(msg_id, "sent" if success else "queued", error)
+
+    def _build_message_frame(self, msg_id, text):
+        """Attribue le numéro de séquence suivant et chiffre (appelé sous tx_lock)."""
+        self.tx_seq += 1
+        header = self.TYPE_MESSAGE + self.MESSAGE_HEADER.pack(self.tx_seq, bytes.fromhex(msg_id))
+        frame = header + self.crypto.encrypt_message(text, header)
+        with self.flight_lock:
+            self.in_flight[self.tx_seq] = [msg_id, frame, time.monotonic()]
+        self.sent_ids.add(msg_id)
+        return frame
+
+    def _window_room(self):
+        """Nombre de nouvelles séquences émissibles (illimité sur transport fiable)."""
+        if self.net.RELIABLE:
+            return self.REDELIVERY_BATCH
+        with self.flight_lock:
+            if not self.in_flight:
+                return self.SEND_WINDOW
+            # Une retransmission doit rester dans la fenêtre anti-rejeu du pair
+            lowest = next(iter(self.in_flight))
+        return max(0, self.SEND_WINDOW - (self.tx_seq + 1 - lowest))
+
+    def _transmit(self, msg_id, text):
+        with self.tx_lock:
+            if msg_id in self.sent_ids:
+                return True  # Déjà parti avec la redélivrance
+            if not self._window_room():
+                self._backlog = True  # Envoyé par _on_tick quand les ACK libèrent la fenêtre
+                return False
+            # Packet: [TYPE_MESSAGE][Seq][MsgId][EncryptedBlob]
+            return self.net.send_bytes(self._build_message_frame(msg_id, text))
+
+    def _redeliver_pending(self):
+        """
+        (Thread expéditeur) Renvoie en lots les messages non acquittés destinés à
+        ce pair. Avant confirmation du SAS, seuls ceux écrits pendant cette session.
+        """
+        self._backlog = False
+        peer = self._peer_id()
+        if peer is None:
+            return
+        confirmed = self.peer_confirmed
+        pending = [(msg_id, text) for msg_id, text in self.store.pending(peer)
+                   if msg_id not in self.sent_ids and (confirmed or msg_id in self.session_ids)
+                   and self._fits(text)]  # Écrit pour un transport aux trames plus grandes
+        if pending:
+            logging.info(f"Redélivrance de {len(pending)} message(s) en attente.")
+            if confirmed:
+                # Les messages sans destinataire sont désormais réservés à ce pair
+                self.store.bind([msg_id for msg_id, _ in pending], peer)
+        while pending:
+            if self.state != ProtocolState.SECURE:
+                return
+            with self.tx_lock:
+                room = min(self._window_room(), self.REDELIVERY_BATCH)
+                if not room:
+                    self._backlog = True
+                    return
+                chunk, pending = pending[:room], pending[room:]
+                batch = [(msg_id, self._build_message_frame(msg_id, text))
+                         for msg_id, text in chunk if msg_id not in self.sent_ids]
+                ok = bool(batch) and self.net.send_many([frame for _, frame in batch])
+            for msg_id, _ in batch:
+                self._notify_send_result(msg_id, "sent" if ok else "queued")
+
+    def _retransmit_expired(self):
+        """(Transport datagramme) Renvoie les messages non acquittés à temps."""
+        now = time.monotonic()
+        with self.flight_lock:
+            expired = [entry for entry in self.in_flight.values()
+                       if now - entry[2] >= self._retransmit_timeout()]
+            for entry in expired:
+                entry[2] = now
+        if expired:
+            # Même trame (même nonce, même séquence) : le pair la dédoublonne
+            self.net.send_many([entry[1] for entry in expired])
+
+    def _retransmit_timeout(self):
+        """Délai de retransmission : jamais sous 2 RTT (lien lent), défaut sinon."""
+        if self.srtt is None:
+            return self.RETRANSMIT_TIMEOUT
+        return max(self.RETRANSMIT_TIMEOUT, 2 * self.srtt)
+
+    def _on_tick(self):
+        """(Thread expéditeur) Timers périodiques."""
+        if self.state == ProtocolState.SECURE and self.heartbeat_interval:
+            if not self._check_liveness():
+                return
+        if self.state == ProtocolState.HANDSHAKING and self._handshake_started_at and \
+                time.monotonic() - self._handshake_started_at >= self.HANDSHAKE_TIMEOUT:
+            logging.warning("Clé du pair non reçue : handshake abandonné.")
+            self._set_status("Erreur : pair injoignable (handshake)", False)
+            self.close()
+            return
+        if self.net.RELIABLE:
+            return
+        if self.state == ProtocolState.HANDSHAKING and self.net.conn:
+            # Sans flux fiable, la clé publique peut se perdre : on la renvoie
+            if time.monotonic() - self._handshake_sent_at >= self.RETRANSMIT_TIMEOUT:
+                self._send_public_key()
+        elif self.state == ProtocolState.SECURE:
+            self._retransmit_expired()
+            if self._backlog:
+                self._redeliver_pending()
+
+    def _check_liveness(self):
+        """(Thread expéditeur) Ferme une session muette, sinon envoie le ping dû."""
+        now = time.monotonic()
+        silence = now - self.last_seen
+        if silence >= self.heartbeat_timeout:
+            logging.warning(f"Aucun signe du pair depuis {silence:.1f} s : session fermée.")
+            self._set_status("Pair injoignable", False)
+            self.close()
+            return False
+        if now - self._last_ping >= self.heartbeat_interval:
+            self._last_ping = now
+            # Pings sans réponse : perdus, ou pair disparu (déjà couvert par last_seen)
+            for seq, sent_at in list(self.pending_pings.items()):
+                if now - sent_at >= self.heartbeat_timeout:
+                    self.pending_pings.pop(seq, None)
+            self.heartbeat_seq += 1
+            self.pending_pings[self.heartbeat_seq] = now
+            self._send_heartbeat(self.HEARTBEAT_PING, self.heartbeat_seq)
+        return True
+
+    def _send_heartbeat(self, kind, seq):
+        """(Thread expéditeur) Ping ou pong : charge vide, en-tête authentifié."""
+        if self.net.is_server:
+            kind |= self.HEARTBEAT_FROM_SERVER
+        header = self.TYPE_HEARTBEAT + self.HEARTBEAT_HEADER.pack(kind, seq)
+        # Packet: [TYPE_HEARTBEAT][Type + rôle][Seq][Nonce + Tag]
+        self.net.send_bytes(header + self.crypto.encrypt_message("", header))
+
+    def _mark_alive(self):
+        """Un paquet authentique du pair vient d'arriver."""
+        self.last_seen = time.monotonic()
+
+    def _transmit_presence(self, status_text):
+        """(Thread expéditeur) Un seul envoi, pas de suivi."""
+        self.presence_seq += 1
+        header = self.TYPE_PRESENCE + self.PRESENCE_HEADER.pack(self.presence_seq)
+        # Packet: [TYPE_PRESENCE][Seq][EncryptedBlob]
+        self.net.send_bytes(header + self.crypto.encrypt_message(status_text, header))
+
+    def _schedule_ack(self):
+        """Demande un ACK ; plusieurs réceptions rapprochées n'en produisent qu'un."""
+        if not self._ack_scheduled:
+            self._ack_scheduled = True
+            self.outbox.submit(self._send_ack)
+
+    def _send_ack(self):
+        """(Thread expéditeur) Envoie l'ACK cumulatif courant."""
+        self._ack_scheduled = False
+        window = self.replay_window
+        header = self.TYPE_ACK + self.ACK_HEADER.pack(window.cumulative, window.selective_acks())
+        # Packet: [TYPE_ACK][Cumul][Nonce + Tag] (charge vide, en-tête authentifié)
+        self.net.send_bytes(header + self.crypto.encrypt_message("", header))
+
+    def _send_first_public_key(self):
+        """Envoie notre clé une seule fois. Elle doit précéder tout paquet chiffré."""
+        with self._key_lock:
+            if not self._handshake_sent_at:
+                self._send_public_key()
+
+    def _send_public_key(self):
+        """Envoie notre clé publique au pair (les clés sont déjà générées)."""
+        try:
+            first_send = not self._handshake_sent_at
+            self._handshake_sent_at = time.monotonic()
+            if first_send:
+                self._handshake_started_at = self._handshake_sent_at
             # Packet: [TYPE_HANDSHAKE][PEM]
-            self.net.send_bytes(self.TYPE_HANDSHAKE + my_pub_pem)
-            self._set_status("Clé publique envoyée. Attente du pair...", False)
+            self.net.send_bytes(self.TYPE_HANDSHAKE + self._my_pub_pem)
+            # La clé du pair a pu arriver entre-temps : ne pas écraser le statut sécurisé
+            if first_send and self.state != ProtocolState.SECURE:
+                self._set_status("Clé publique envoyée. Attente du pair...", False)
         except Exception as e:
-            logging.error(f"Erreur handshake init: {e}")
+            logging.error(f"Erreur envoi clé: {e}")
             self.close()
 
     def _handle_network_data(self, data):
+        """Point d'entrée de la réception (thread réseau)."""
+        if CAPTURE.active:  # Capture de profilage à la demande (transports sans accroche propre)
+            return CAPTURE.run('receive', self._dispatch_packet, data)
+        return self._dispatch_packet(data)
+
+    def _dispatch_packet(self, data):
         """Switch sur le type de paquet."""
         if len(data) < 1:
             return
@@ -122,40 +507,164 @@ class SecureMessenger:
             self._handle_handshake_packet(payload)
         elif msg_type == self.TYPE_MESSAGE:
             self._handle_secure_message_packet(payload)
+        elif msg_type == self.TYPE_ACK:
+            self._handle_ack_packet(payload)
+        elif msg_type == self.TYPE_PRESENCE:
+            self._handle_presence_packet(payload)
+        elif msg_type == self.TYPE_HEARTBEAT:
+            self._handle_heartbeat_packet(payload)
         else:
             logging.warning(f"Type de paquet inconnu reçu: {msg_type}")
 
     def _handle_handshake_packet(self, peer_pub_key_pem):
         """Reçoit la clé du pair, calcule le secret."""
         if self.state not in [ProtocolState.HANDSHAKING, ProtocolState.IDLE]:
-            # Re-keying non supporté pour l'instant
+            # Re-keying non supporté pour l'instant. Sur UDP, la même clé reçue à
+            # nouveau signifie que le pair n'a pas reçu la nôtre : on la renvoie.
+            if not self.net.RELIABLE and peer_pub_key_pem == self._peer_pub_pem:
+                self.outbox.submit(self._send_public_key)
             return
 
+        # La clé du pair peut arriver avant que la nôtre soit partie (thread de
+        # réception déjà lancé) : l'envoyer d'abord, sinon nos messages la précéderaient
+        self._send_first_public_key()
+
         try:
             fingerprint = self.crypto.compute_shared_secret(peer_pub_key_pem)
-            self.state = ProtocolState.SECURE
+            self._peer_pub_pem = peer_pub_key_pem
+            with self._session_lock:
+                self._reset_session()
+                self.fingerprint = fingerprint
+                self.state = ProtocolState.SECURE
             self._set_status("CANAL SÉCURISÉ ÉTABLI", True, fingerprint)
             logging.info(f"Handshake terminé. SAS Fingerprint: {fingerprint}")
+            # L'arriéré des sessions précédentes attend confirm_peer() : le SAS
+            # n'a pas encore été comparé, le pair n'est pas authentifié.
         except Exception as e:
             logging.error(f"Erreur handshake finish: {e}")
             self._set_status("Erreur critique Handshake", False)
             self.close()
 
-    def _handle_secure_message_packet(self, encrypted_blob):
-        """Déchiffre et notifie l'UI."""
+    def _handle_secure_message_packet(self, packet):
+        """Vérifie la séquence, déchiffre, acquitte et notifie l'UI."""
         if self.state != ProtocolState.SECURE:
             logging.warning("Message chiffré reçu avant fin handshake.")
             return
+        if len(packet) < self.MESSAGE_HEADER.size:
+            logging.warning("Message chiffré tronqué, rejeté.")
+            return
+
+        seq, raw_id = self.MESSAGE_HEADER.unpack_from(packet)
+        if not self.replay_window.check(seq):
+            if self.net.RELIABLE:
+                logging.warning(f"Rejeu détecté (seq {seq}) : message rejeté.")
+            else:
+                # Retransmission d'un message déjà reçu : notre ACK s'est perdu
+                self._schedule_ack()
+            return
 
+        header = self.TYPE_MESSAGE + packet[:self.MESSAGE_HEADER.size]
         try:
-            plaintext = self.crypto.decrypt_message(encrypted_blob)
-            if self.on_message_received:
-                self.on_message_received(plaintext)
+            plaintext = self.crypto.decrypt_message(packet[self.MESSAGE_HEADER.size:], header)
         except ValueError as e:
             logging.error(f"Intégrité violée ! Message rejeté : {e}")
             # Optionnel: Fermer la connexion en cas d'attaque
+            return
         except Exception as e:
             logging.error(f"Erreur déchiffrement: {e}")
+            return
+
+        self._mark_alive()
+        try:
+            # Un message redélivré (ACK perdu) n'est présenté qu'une fois
+            if self.store.mark_received(raw_id.hex()) and self.on_message_received:
+                self.on_message_received(plaintext)
+        finally:
+            # Tag valide : le numéro est authentique, la fenêtre peut glisser.
+            # Mise à jour APRÈS remise à l'UI : l'ACK (qui lit le cumul) signifie "affiché".
+            self.replay_window.update(seq)
+            self._schedule_ack()
+
+    def _handle_ack_packet(self, packet):
+        """ACK cumulatif (tout numéro <= cumul) + sélectif (bit i => cumul + 1 + i)."""
+        if self.state != ProtocolState.SECURE or len(packet) < self.ACK_HEADER.size:
+            return
+
+        cumulative, selective = self.ACK_HEADER.unpack_from(packet)
+        header = self.TYPE_ACK + packet[:self.ACK_HEADER.size]
+        try:
+            self.crypto.decrypt_message(packet[self.ACK_HEADER.size:], header)
+        except ValueError as e:
+            logging.error(f"ACK invalide rejeté : {e}")
+            return
+
+        advanced = cumulative > self.acked
+        self.acked = max(self.acked, cumulative)
+        with self.flight_lock:
+            delivered = [self.in_flight.pop(seq)[0] for seq in list(self.in_flight)
+                         if seq <= cumulative or (selective >> (seq - cumulative - 1)) & 1]
+        # Sans numéro propre, un ACK rejoué s'authentifie encore : seul un ACK qui
+        # acquitte du nouveau prouve que le pair est vivant
+        if advanced or delivered:
+            self._mark_alive()
+        if not delivered:
+            return
+        self.store.remove(delivered)
+        for msg_id in delivered:
+            self._notify_send_result(msg_id, "delivered")
+
+    def _handle_presence_packet(self, packet):
+        """Présence du pair : anti-rejeu, mais ni ACK ni ordre garanti."""
+        if self.state != ProtocolState.SECURE or len(packet) < self.PRESENCE_HEADER.size:
+            return
+
+        (seq,) = self.PRESENCE_HEADER.unpack_from(packet)
+        if not self.presence_window.check(seq):
+            return
+        header = self.TYPE_PRESENCE + packet[:self.PRESENCE_HEADER.size]
+        try:
+            status_text = self.crypto.decrypt_message(packet[self.PRESENCE_HEADER.size:], header)
+        except ValueError as e:
+            logging.error(f"Présence invalide rejetée : {e}")
+            return
+        self._mark_alive()
+        self.presence_window.update(seq)
+        if self.on_presence:
+            self.on_presence(status_text)
+
+    def _handle_heartbeat_packet(self, packet):
+        """Ping : répondre par un pong. Pong : mesurer le RTT."""
+        if self.state != ProtocolState.SECURE or len(packet) < self.HEARTBEAT_HEADER.size:
+            return
+
+        flags, seq = self.HEARTBEAT_HEADER.unpack_from(packet)
+        if bool(flags & self.HEARTBEAT_FROM_SERVER) == self.net.is_server:
+            logging.warning("Heartbeat réfléchi (notre propre rôle) : rejeté.")
+            return
+        kind = flags & ~self.HEARTBEAT_FROM_SERVER
+        if kind == self.HEARTBEAT_PING and not self.heartbeat_window.check(seq):
+            return
+        header = self.TYPE_HEARTBEAT + packet[:self.HEARTBEAT_HEADER.size]
+        try:
+            self.crypto.decrypt_message(packet[self.HEARTBEAT_HEADER.size:], header)
+        except ValueError as e:
+            logging.error(f"Heartbeat invalide rejeté : {e}")
+            return
+        self._mark_alive()
+
+        if kind == self.HEARTBEAT_PING:
+            self.heartbeat_window.update(seq)
+            self.outbox.submit(lambda: self._send_heartbeat(self.HEARTBEAT_PONG, seq))
+            return
+        # Pong : seul un ping encore en attente compte (un pong rejoué est ignoré)
+        sent_at = self.pending_pings.pop(seq, None)
+        if sent_at is None:
+            return
+        rtt = time.monotonic() - sent_at
+        # Lissage exponentiel (RFC 6298, alpha = 1/8)
+        self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+        if self.on_rtt:
+            self.on_rtt(round(self.srtt * 1000, 1))
 
     def _on_disconnect(self):
         self.state = ProtocolState.IDLE
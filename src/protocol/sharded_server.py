@@ -0,0 +1,252 @@
+import os
+import queue
+import socket
+import logging
+import threading
+import multiprocessing
+
+class ShardedServer:
+    """
+    Serveur multi-processus (mode hub).
+    - K processus workers ouvrent chacun le MÊME port TCP avec SO_REUSEPORT :
+      le noyau répartit les connexions entrantes entre eux.
+    - Chaque worker possède ses sessions (SecureMessenger) et son propre GIL :
+      ECDH et AES-GCM de sessions différentes tournent sur des cœurs différents.
+    - Les workers remontent leurs événements au parent via une file
+      multiprocessing ; le parent agrège l'état pour l'UI (snapshot()).
+    - Le parent route les envois vers le worker qui possède la session.
+    - Un worker mort (crash, kill) ne remonte plus rien : ses sessions sont
+      retirées par le parent (vérification périodique, snapshot(), send()).
+    """
+
+    def __init__(self, port, workers=None, host='0.0.0.0', on_event=None,
+                 heartbeat_interval=None, heartbeat_timeout=None):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise OSError("SO_REUSEPORT non disponible sur ce système (Linux/BSD requis).")
+        self.port = port
+        self.host = host
+        self.worker_count = workers or os.cpu_count() or 1
+        self.on_event = on_event  # (session_id, kind, data) pour l'UI
+        self.heartbeat = (heartbeat_interval, heartbeat_timeout)  # None = défauts du protocole
+
+        # 'spawn' : pas de fork d'un processus déjà multi-thread (Flask, logging)
+        self._ctx = multiprocessing.get_context('spawn')
+        self.events = self._ctx.Queue()
+        self.processes = []
+        self.commands = []  # Une file de commandes par worker
+
+        self.workers = {}   # index -> {"pid", "error" si l'écoute a échoué}
+        self.sessions = {}  # session_id -> état agrégé
+        self.lock = threading.Lock()
+        self.collector = None
+
+    def start(self):
+        """Lance les workers et le thread collecteur d'événements."""
+        for index in range(self.worker_count):
+            commands = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(index, self.host, self.port, self.events, commands, self.heartbeat),
+                daemon=True
+            )
+            process.start()
+            self.commands.append(commands)
+            self.processes.append(process)
+
+        self.collector = threading.Thread(target=self._collect_events, daemon=True)
+        self.collector.start()
+        logging.info(f"Serveur multi-processus : {self.worker_count} workers sur le port {self.port}")
+
+    def send(self, session_id, text):
+        """Envoie un message sur une session (routé vers le worker propriétaire)."""
+        with self.lock:
+            purged = self._purge_dead_workers()
+            session = self.sessions.get(session_id)
+        self._notify_purged(purged)
+        if not session or not session["is_secure"]:
+            return False
+        self.commands[session["worker"]].put(('send', session_id, text))
+        return True
+
+    def snapshot(self):
+        """État agrégé de tous les workers et de leurs sessions."""
+        with self.lock:
+            purged = self._purge_dead_workers()
+            workers = []
+            for index, process in enumerate(self.processes):
+                info = self.workers.get(index, {})
+                workers.append({
+                    "index": index,
+                    "pid": info.get("pid"),
+                    "alive": process.is_alive(),
+                    "error": info.get("error"),
+                    "sessions": sum(1 for s in self.sessions.values() if s["worker"] == index),
+                })
+            snapshot = {
+                "port": self.port,
+                "workers": workers,
+                "sessions": [dict(s, id=sid) for sid, s in self.sessions.items()],
+            }
+        self._notify_purged(purged)
+        return snapshot
+
+    def stop(self, timeout=2.0):
+        """Arrête les workers (fermeture des sessions), puis le collecteur."""
+        for commands in self.commands:
+            commands.put(('stop',))
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.events.put(None)
+
+    # --- Interne ---
+
+    def _collect_events(self):
+        """Thread du parent : applique les événements des workers."""
+        while True:
+            try:
+                event = self.events.get(timeout=1.0)
+            except queue.Empty:
+                event = ()  # Rien reçu : seulement la vérification des workers
+            if event is None:
+                break
+            if event:
+                self._apply_event(*event)
+            with self.lock:
+                purged = self._purge_dead_workers()
+            self._notify_purged(purged)
+
+    def _apply_event(self, index, session_id, kind, data):
+        with self.lock:
+            if kind == 'worker':
+                self.workers[index] = data  # Transmis aussi à on_event (erreur d'écoute)
+            elif kind == 'session':
+                self.sessions[session_id] = dict(data, worker=index, status="Connexion...",
+                                                 is_secure=False, fingerprint=None,
+                                                 received=0, sent=0, rtt_ms=None)
+            elif session_id in self.sessions:
+                session = self.sessions[session_id]
+                if kind == 'status':
+                    session.update(data)
+                    if data["status"] == "Déconnecté":
+                        del self.sessions[session_id]
+                elif kind == 'message':
+                    session["received"] += 1
+                elif kind == 'delivery' and data["status"] == "sent":
+                    session["sent"] += 1
+                elif kind == 'rtt':
+                    session["rtt_ms"] = data["rtt_ms"]
+        self._emit(session_id, kind, data)
+
+    def _purge_dead_workers(self):
+        """Retire les sessions des workers morts (appelé sous self.lock) ; renvoie leurs ids."""
+        dead = {index for index, process in enumerate(self.processes) if not process.is_alive()}
+        purged = [sid for sid, s in self.sessions.items() if s["worker"] in dead]
+        for session_id in purged:
+            del self.sessions[session_id]
+        return purged
+
+    def _notify_purged(self, purged):
+        """Signale à l'UI, hors verrou, les sessions perdues avec leur worker."""
+        for session_id in purged:
+            logging.warning(f"Session {session_id} perdue : worker arrêté")
+            self._emit(session_id, 'status', {
+                "status": "Déconnecté", "is_secure": False, "fingerprint": None
+            })
+
+    def _emit(self, session_id, kind, data):
+        if self.on_event:
+            try:
+                self.on_event(session_id, kind, data)
+            except Exception as e:
+                logging.error(f"Erreur dans le callback on_event: {e}")
+
+def _worker_main(index, host, port, events, commands, heartbeat=(None, None)):
+    """Point d'entrée d'un processus worker."""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - [WORKER {index}] - %(message)s')
+    # Import ici : le processus 'spawn' ne charge que ce dont il a besoin
+    from protocol.secure_protocol import SecureMessenger
+    from diagnostics.profiler import install_signal_handler
+
+    install_signal_handler()  # Profilage d'un worker : kill -USR1 <pid> (voir snapshot())
+
+    sessions = {}
+    lock = threading.Lock()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)  # Même port pour tous les workers
+        sock.bind((host, port))
+        sock.listen(64)
+    except OSError as e:
+        # Port pris sans SO_REUSEPORT, adresse invalide... : le parent l'affiche
+        logging.error(f"Écoute impossible sur {host}:{port} : {e}")
+        sock.close()
+        events.put((index, None, 'worker', {"pid": os.getpid(), "error": str(e)}))
+        return
+    events.put((index, None, 'worker', {"pid": os.getpid()}))
+
+    def run_commands():
+        """Commandes du parent : envoi de message, arrêt."""
+        while True:
+            try:
+                command = commands.get()
+            except (EOFError, OSError):
+                command = ('stop',)
+            if command[0] == 'send':
+                _, session_id, text = command
+                with lock:
+                    messenger = sessions.get(session_id)
+                if messenger:
+                    messenger.queue_message(text)
+            elif command[0] == 'stop':
+                break
+        sock.close()  # Débloque accept()
+
+    threading.Thread(target=run_commands, daemon=True).start()
+
+    counter = 0
+    while True:
+        try:
+            conn, address = sock.accept()
+        except OSError:
+            break
+        counter += 1
+        session_id = f"{index}-{counter}"
+        events.put((index, session_id, 'session', {"peer": f"{address[0]}:{address[1]}"}))
+
+        def make_callbacks(session_id):
+            def on_message(plaintext):
+                events.put((index, session_id, 'message', {"text": plaintext}))
+
+            def on_status(status_msg, is_secure, fingerprint=None):
+                events.put((index, session_id, 'status', {
+                    "status": status_msg, "is_secure": is_secure, "fingerprint": fingerprint
+                }))
+                if status_msg == "Déconnecté":
+                    with lock:
+                        sessions.pop(session_id, None)
+
+            def on_send_result(msg_id, status, error=None):
+                events.put((index, session_id, 'delivery', {"id": msg_id, "status": status, "error": error}))
+
+            def on_rtt(rtt_ms):
+                events.put((index, session_id, 'rtt', {"rtt_ms": rtt_ms}))
+
+            return on_message, on_status, on_send_result, on_rtt
+
+        on_message, on_status, on_send_result, on_rtt = make_callbacks(session_id)
+        # Heartbeats : une session dont le pair a disparu libère son slot en quelques secondes
+        messenger = SecureMessenger(on_message, on_status, on_send_result, on_rtt=on_rtt,
+                                    heartbeat_interval=heartbeat[0], heartbeat_timeout=heartbeat[1])
+        with lock:
+            sessions[session_id] = messenger
+        # Génération des clés + handshake hors de la boucle d'acceptation
+        threading.Thread(target=messenger.accept_connection, args=(conn, address), daemon=True).start()
+
+    with lock:
+        remaining = list(sessions.values())
+    for messenger in remaining:
+        messenger.close()
@@ -18,6 +18,14 @@ function initEventSource() {
             updateStatus(data.data);
         } else if (data.type === 'message') {
             addMessage(data.data);
+        } else if (data.type === 'delivery') {
+            updateDelivery(data.data);
+        } else if (data.type === 'presence') {
+            updatePresence(data.data.presence);
+        } else if (data.type === 'rtt') {
+            updateRtt(data.data.rtt_ms);
+        } else if (data.type === 'shard') {
+            scheduleShardsRefresh();
         }
     };
 
@@ -37,6 +45,11 @@ function selectMode(mode) {
     document.getElementById('clientForm').classList.toggle('hidden', mode !== 'client');
 }
 
+// Selected transport (tcp / udp)
+function getTransport() {
+    return document.getElementById('transport').value;
+}
+
 // Start Server
 async function startServer() {
     const port = document.getElementById('serverPort').value;
@@ -44,7 +57,7 @@ async function startServer() {
     const response = await fetch('/api/start_server', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ port: parseInt(port) })
+        body: JSON.stringify({ port: parseInt(port), transport: getTransport() })
     });
 
     const result = await response.json();
@@ -70,7 +83,7 @@ async function connectToPeer() {
     const response = await fetch('/api/connect', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ ip, port: parseInt(port) })
+        body: JSON.stringify({ ip, port: parseInt(port), transport: getTransport() })
     });
 
     const result = await response.json();
@@ -101,15 +114,68 @@ function updateStatus(data) {
         document.getElementById('chatContainer').classList.remove('hidden');
         document.getElementById('disconnectArea').classList.remove('hidden');
 
-        // Update fingerprint
+        // Update fingerprint (a new SAS must be confirmed again)
         if (data.fingerprint) {
-            document.getElementById('fingerprint').textContent = data.fingerprint;
+            const fingerprint = document.getElementById('fingerprint');
+            if (fingerprint.textContent !== data.fingerprint) {
+                fingerprint.textContent = data.fingerprint;
+                setSasConfirmed(false);
+            }
         }
     } else if (data.status.includes('...')) {
         statusIndicator.classList.add('connecting');
     }
+    if (!data.is_secure) {
+        updateRtt(null);  // Session closed (or peer unreachable): the last RTT is stale
+    }
 }
 
+// Confirm the SAS: messages queued for this peer are only redelivered after this
+async function confirmSas() {
+    const response = await fetch('/api/confirm_sas', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ fingerprint: document.getElementById('fingerprint').textContent })
+    });
+
+    const result = await response.json();
+    if (result.success) {
+        setSasConfirmed(true);
+    } else {
+        alert('Erreur: ' + result.error);
+    }
+}
+
+function setSasConfirmed(confirmed) {
+    const button = document.getElementById('confirmSasBtn');
+    button.disabled = confirmed;
+    button.textContent = confirmed ? '✅ SAS confirmé'
+        : '✔️ Codes identiques : envoyer les messages en attente';
+}
+
+// Peer presence (fire-and-forget, may be missing)
+function updatePresence(presence) {
+    document.getElementById('peerPresence').textContent = presence ? `· Pair ${presence}` : '';
+}
+
+// Round-trip time measured by the encrypted heartbeats
+function updateRtt(rttMs) {
+    document.getElementById('peerRtt').textContent = rttMs != null ? `· RTT ${rttMs} ms` : '';
+}
+
+// Announce our own presence when the tab gains / loses focus
+function sendPresence(status) {
+    fetch('/api/presence', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ status })
+    });
+}
+
+document.addEventListener('visibilitychange', () => {
+    sendPresence(document.hidden ? 'absent' : 'en ligne');
+});
+
 // Send Message
 async function sendMessage() {
     const input = document.getElementById('messageInput');
@@ -139,17 +205,40 @@ function addMessage(msgData) {
 
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${msgData.from === 'Moi' ? 'own' : 'other'}`;
+    if (msgData.id) {
+        messageDiv.dataset.id = msgData.id;
+    }
 
     messageDiv.innerHTML = `
         <div class="message-header">
             <strong>${msgData.from}</strong>
             <span>${msgData.time}</span>
+            <span class="delivery"></span>
         </div>
         <div class="message-bubble">${escapeHtml(msgData.text)}</div>
     `;
 
     messagesDiv.appendChild(messageDiv);
     messagesDiv.scrollTop = messagesDiv.scrollHeight;
+
+    if (msgData.delivery) {
+        updateDelivery({ id: msgData.id, status: msgData.delivery });
+    }
+}
+
+// Update delivery marker of an outgoing message
+function updateDelivery(data) {
+    const messageDiv = document.querySelector(`.message[data-id="${data.id}"]`);
+    if (!messageDiv) return;
+
+    const marker = messageDiv.querySelector('.delivery');
+    // Ordre des étapes : un "sent" de redélivrance ne remplace pas un "delivered"
+    if (marker.classList.contains('delivered')) return;
+
+    const labels = { pending: '⏳', queued: '⏳', sent: '✓', delivered: '✓✓' };
+    marker.textContent = labels[data.status] || '';
+    marker.className = `delivery ${data.status}`;
+    marker.title = data.error || '';
 }
 
 // Handle Enter Key
@@ -182,9 +271,51 @@ async function disconnect() {
 
     // Reset status
     document.getElementById('statusText').textContent = 'Non connecté';
+    updatePresence(null);
+    updateRtt(null);
     document.getElementById('statusIndicator').classList.remove('secure', 'connecting');
 }
 
+// Multi-process hub: aggregated worker / session status
+let shardsRefreshTimer = null;
+
+function scheduleShardsRefresh() {
+    // Coalesce bursts of worker events into one request
+    if (!shardsRefreshTimer) {
+        shardsRefreshTimer = setTimeout(() => {
+            shardsRefreshTimer = null;
+            refreshShards();
+        }, 250);
+    }
+}
+
+async function refreshShards() {
+    const response = await fetch('/api/shards');
+    const shards = await response.json();
+    if (!shards.enabled) return false;
+
+    document.getElementById('shardsPanel').classList.remove('hidden');
+    const alive = shards.workers.filter(w => w.alive).length;
+    const errors = shards.workers.filter(w => w.error).map(w => `worker ${w.index} : ${w.error}`);
+    document.getElementById('shardsSummary').textContent =
+        `Port ${shards.port} · ${alive}/${shards.workers.length} workers actifs · ${shards.sessions.length} session(s)` +
+        (errors.length ? ` · Erreur ${errors.join(', ')}` : '');
+
+    document.getElementById('shardsSessions').innerHTML = shards.sessions.map(s => `
+        <tr>
+            <td>${escapeHtml(s.id)}</td>
+            <td>${s.worker}</td>
+            <td>${escapeHtml(s.peer)}</td>
+            <td>${escapeHtml(s.status)}</td>
+            <td>${escapeHtml(s.fingerprint || '')}</td>
+            <td>${s.received}</td>
+            <td>${s.sent}</td>
+            <td>${s.rtt_ms != null ? s.rtt_ms + ' ms' : ''}</td>
+        </tr>
+    `).join('');
+    return true;
+}
+
 // Utility: Escape HTML
 function escapeHtml(text) {
     const div = document.createElement('div');
@@ -194,12 +325,21 @@ function escapeHtml(text) {
 
 // Load initial state on page load
 window.addEventListener('load', async () => {
+    if (await refreshShards()) {
+        // Hub mode: the node is driven by the daemon, not by this page
+        document.getElementById('connectionPanel').style.display = 'none';
+        initEventSource();
+        return;
+    }
+
     const response = await fetch('/api/state');
     const state = await response.json();
 
     if (state.is_secure) {
         // Already connected, restore UI
         updateStatus(state);
+        updatePresence(state.presence);
+        updateRtt(state.rtt_ms);
         state.messages.forEach(msg => addMessage(msg));
         document.getElementById('connectionPanel').style.display = 'none';
         initEventSource();
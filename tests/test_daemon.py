@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+import subprocess
+import tempfile
+
+# Ajout du path (racine pour daemon.py)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from daemon import build_config
+
+def test_lazy_imports():
+    print("=== TEST DÉMARRAGE LÉGER ===")
+    # Le nœud doit être en écoute sans avoir chargé Flask ni `cryptography`
+    code = (
+        "import sys, daemon\n"
+        "from protocol.secure_protocol import SecureMessenger\n"
+        "m = SecureMessenger(None, None)\n"
+        "assert m.net.listen(0, '127.0.0.1')\n"
+        "m.net.close()\n"
+        "print('flask' in sys.modules, 'cryptography' in sys.modules)\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT,
+                         capture_output=True, text=True, timeout=30)
+    print(out.stdout, out.stderr)
+    assert out.stdout.strip().splitlines()[-1] == "False False"
+    print("[SUCCESS] Écoute atteinte sans import de Flask ni de cryptography.")
+
+def test_build_config():
+    print("=== TEST CONFIGURATION ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'relay.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"mode": "client", "peer_ip": "10.0.0.2", "port": 7000, "stdin": False}, f)
+
+        config = build_config(['--config', path])
+        assert config["mode"] == 'client' and config["peer_ip"] == '10.0.0.2'
+        assert config["port"] == 7000 and config["stdin"] is False
+
+        # La ligne de commande est prioritaire sur le fichier
+        config = build_config(['--config', path, '--listen', '9000'])
+        assert config["mode"] == 'server' and config["port"] == 9000
+
+    config = build_config(['--connect', '192.168.1.20:8000'])
+    assert (config["peer_ip"], config["port"], config["web"]) == ('192.168.1.20', 8000, False)
+
+    config = build_config(['--listen', '9000', '--heartbeat', '1', '--heartbeat-timeout', '3'])
+    assert (config["heartbeat"], config["heartbeat_timeout"]) == (1.0, 3.0)
+
+    config = build_config(['--attach', '/tmp/chat.sock'])
+    assert (config["mode"], config["ipc"]) == ('attach', '/tmp/chat.sock')
+    print("[SUCCESS] Fusion fichier / arguments correcte.")
+
+if __name__ == "__main__":
+    test_lazy_imports()
+    test_build_config()
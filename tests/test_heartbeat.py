@@ -0,0 +1,133 @@
+import sys
+import os
+import time
+import socket
+import threading
+
+# Ajout du path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from protocol.secure_protocol import SecureMessenger
+
+def _pair(port, transport, bob_status=None, alice_rtt=None):
+    """Bob (serveur) et Alice (client) avec des heartbeats rapides."""
+    secure = threading.Event()
+
+    def on_status(msg, is_secure, fp):
+        if is_secure:
+            secure.set()
+
+    bob = SecureMessenger(None, bob_status, transport=transport,
+                          heartbeat_interval=0.2, heartbeat_timeout=1.0)
+    alice = SecureMessenger(None, on_status, transport=transport, on_rtt=alice_rtt,
+                            heartbeat_interval=0.2, heartbeat_timeout=1.0)
+    threading.Thread(target=bob.start_server, args=(port, '127.0.0.1'), daemon=True).start()
+    time.sleep(0.3)
+    alice.connect('127.0.0.1', port)
+    assert secure.wait(5), "Handshake non terminé"
+    time.sleep(0.2)  # Bob passe SECURE à la réception de la clé d'Alice
+    return bob, alice
+
+def test_heartbeat_rtt():
+    print("=== TEST HEARTBEAT : RTT ET KEEPALIVE ===")
+    rtts = []
+    bob, alice = _pair(8880, 'tcp', alice_rtt=rtts.append)
+
+    time.sleep(1.0)
+    status = alice.get_session_status()
+    print(f"    - Session Alice : {status}")
+    assert rtts, "Aucun pong reçu"
+    assert status["state"] == "secure" and status["rtt_ms"] is not None
+    assert status["last_seen_s"] < 1.0
+    print("[SUCCESS] RTT mesuré par les heartbeats.")
+
+    # Options keepalive posées sur la connexion TCP
+    conn = alice.net.conn
+    assert conn.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE) == 1
+    if hasattr(socket, 'TCP_USER_TIMEOUT'):
+        assert conn.getsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT) == 1000
+    print("[SUCCESS] Keepalive TCP configuré.")
+
+    # Un ping d'Alice renvoyé tel quel vers Alice (réflexion) ne prouve rien
+    header = alice.TYPE_HEARTBEAT + alice.HEARTBEAT_HEADER.pack(alice.HEARTBEAT_PING, 999)
+    reflected = header + alice.crypto.encrypt_message("", header)
+    alice.last_seen = 0.0
+    alice._handle_network_data(reflected)
+    assert alice.last_seen == 0.0
+    alice._mark_alive()
+    print("[SUCCESS] Heartbeat réfléchi rejeté.")
+
+    alice.close()
+    bob.close()
+
+def _check_teardown(port, transport):
+    statuses = []
+    down = threading.Event()
+
+    def on_status(msg, is_secure, fp):
+        statuses.append(msg)
+        if msg == "Déconnecté":
+            down.set()
+
+    bob, alice = _pair(port, transport, bob_status=on_status)
+
+    # Alice se tait sans fermer la connexion (pas de FIN) : plus de pong ni d'ACK
+    alice.outbox.stop()
+    start = time.monotonic()
+    assert down.wait(3), f"[{transport}] session de Bob non fermée"
+    elapsed = time.monotonic() - start
+    assert "Pair injoignable" in statuses
+    print(f"    - [{transport}] Session fermée après {elapsed:.1f} s de silence")
+    alice.close()
+    bob.close()
+
+def _check_ack_replay(port):
+    statuses = []
+    down = threading.Event()
+
+    def on_status(msg, is_secure, fp):
+        statuses.append(msg)
+        if msg == "Déconnecté":
+            down.set()
+
+    bob, alice = _pair(port, 'udp', bob_status=on_status)
+    captured = []
+    original = bob.net.on_receive
+    bob.net.on_receive = lambda data: (captured.append(data), original(data))
+    assert bob.send_message("à acquitter")
+    time.sleep(0.3)
+    ack = next(d for d in captured if d[:1] == SecureMessenger.TYPE_ACK)
+
+    # Alice disparaît ; un attaquant rejoue son ACK authentique (source usurpée)
+    alice.outbox.stop()
+    start = time.monotonic()
+    while not down.is_set() and time.monotonic() - start < 4:
+        bob._handle_network_data(ack)
+        time.sleep(0.3)
+    assert down.is_set(), "Un ACK rejoué maintient la session en vie"
+    assert "Pair injoignable" in statuses
+    alice.close()
+    bob.close()
+
+def test_dead_peer_teardown():
+    print("=== TEST HEARTBEAT : PAIR DISPARU ===")
+    _check_teardown(8881, 'tcp')
+    _check_teardown(8882, 'udp')
+    print("[SUCCESS] Pair disparu détecté en quelques secondes.")
+    _check_ack_replay(8887)
+    print("[SUCCESS] ACK rejoué sans effet sur la vivacité.")
+
+def test_heartbeat_config():
+    try:
+        SecureMessenger(None, None, heartbeat_interval=5, heartbeat_timeout=2)
+        assert False, "Configuration incohérente acceptée"
+    except ValueError:
+        pass
+    idle = SecureMessenger(None, None, heartbeat_interval=0)
+    assert idle.net.dead_peer_timeout is None
+    print("[SUCCESS] Configuration des heartbeats validée.")
+
+if __name__ == "__main__":
+    test_heartbeat_rtt()
+    test_dead_peer_teardown()
+    test_heartbeat_config()
@@ -0,0 +1,134 @@
+import sys
+import os
+import time
+import socket
+import tempfile
+import threading
+
+# Ajout du path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from ipc.ipc_protocol import encode, decode, pack_frame, OP_SEND, OP_STATUS
+from ipc.ipc_server import IpcServer
+from ipc.ipc_client import IpcClient
+from protocol.secure_protocol import SecureMessenger
+
+def test_codec():
+    print("=== TEST CODEC IPC ===")
+    value = {"status": "CANAL SÉCURISÉ ÉTABLI", "is_secure": True, "fingerprint": None,
+             "rtt_ms": 0.8, "seq": -3, "messages": [["message", {"text": "é"}]]}
+    data = encode(value)
+    assert decode(data) == value
+    for corrupted in (data[:-1], data + b'N', b'?'):
+        try:
+            decode(corrupted)
+            assert False, "Donnée corrompue acceptée"
+        except ValueError:
+            pass
+    print(f"[SUCCESS] Encodage binaire compact ({len(data)} octets).")
+
+class Frontend:
+    """Frontend de test : enregistre les événements reçus."""
+
+    def __init__(self, path):
+        self.events = []
+        self.changed = threading.Condition()
+        self.client = IpcClient(path, on_event=self.on_event).connect()
+        self.client.subscribe()
+        assert self.wait_for(lambda k, d: k == 'snapshot'), "Instantané non reçu"
+
+    def on_event(self, kind, data):
+        with self.changed:
+            self.events.append((kind, data))
+            self.changed.notify_all()
+
+    def wait_for(self, predicate, timeout=5):
+        with self.changed:
+            return self.changed.wait_for(lambda: any(predicate(k, d) for k, d in self.events),
+                                         timeout)
+
+def test_daemon_ipc():
+    print("=== TEST API IPC DU DAEMON ===")
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'chat.sock')
+    bob_received = []
+    secure = threading.Event()
+
+    # "Daemon" : la session d'Alice, exposée via IPC
+    ipc = IpcServer(path)
+    def on_status(msg, is_secure, fp):
+        ipc.on_status(msg, is_secure, fp)
+        if is_secure:
+            secure.set()
+    alice = SecureMessenger(ipc.on_message, on_status, ipc.on_send_result,
+                            on_presence=ipc.on_presence, on_rtt=ipc.on_rtt)
+    ipc.messenger = alice
+    ipc.start()
+    assert oct(os.stat(path).st_mode & 0o777) == '0o600'
+
+    bob = SecureMessenger(bob_received.append, None)
+    threading.Thread(target=bob.start_server, args=(8883, '127.0.0.1'), daemon=True).start()
+    time.sleep(0.3)
+    alice.connect('127.0.0.1', 8883)
+    assert secure.wait(5)
+    time.sleep(0.2)
+
+    # Deux frontends rattachés au même daemon
+    ui, cli = Frontend(path), Frontend(path)
+    msg_id = ui.client.queue_message("depuis l'UI")
+    assert msg_id
+    assert cli.wait_for(lambda k, d: k == 'message' and d.get("id") == msg_id)
+    assert ui.wait_for(lambda k, d: k == 'delivery' and d["id"] == msg_id and d["status"] == "delivered")
+    assert bob_received == ["depuis l'UI"]
+    bob.send_message("réponse")
+    assert ui.wait_for(lambda k, d: k == 'message' and d["text"] == "réponse")
+    assert cli.wait_for(lambda k, d: k == 'message' and d["text"] == "réponse")
+    status = cli.client.get_session_status()
+    assert status["state"] == "secure" and status["transport"] == "tcp"
+    assert not cli.client.confirm_peer("0000 0000") and cli.client.confirm_peer()
+    assert cli.client.get_session_status()["peer_confirmed"]
+    print("[SUCCESS] Deux frontends : envoi, réception et statut partagés.")
+
+    # Redémarrage de l'UI : la session continue, l'historique est rejoué
+    ui.client.detach()
+    time.sleep(0.2)
+    assert alice.state.name == "SECURE"
+    ui = Frontend(path)
+    snapshot = next(d for k, d in ui.events if k == 'snapshot')
+    assert snapshot["is_secure"] is True
+    assert [m["text"] for m in snapshot["messages"]] == ["depuis l'UI", "réponse"]
+    assert snapshot["messages"][0]["delivery"] == "delivered"
+    print("[SUCCESS] UI redémarrée sans couper la session (instantané rejoué).")
+
+    # Rafale d'événements : livrés par lots, sans perte
+    for i in range(300):
+        ipc.on_presence(f"p{i}")
+    assert cli.wait_for(lambda k, d: k == 'presence' and d["presence"] == "p299")
+    assert len([1 for k, _ in cli.events if k == 'presence']) == 300
+    print("[SUCCESS] Rafale de 300 événements livrée.")
+
+    # Requêtes bien tramées mais de forme invalide : frontend détaché, daemon intact
+    attached = len(ipc.clients)
+    for op, value in ((OP_SEND, None), (OP_SEND, [1]), (OP_STATUS, 7)):
+        raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        raw.settimeout(2)
+        raw.connect(path)
+        raw.sendall(pack_frame(op, value))
+        assert raw.recv(1) == b''
+        raw.close()
+    deadline = time.monotonic() + 2
+    while len(ipc.clients) != attached and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(ipc.clients) == attached  # Connexions malformées retirées
+    assert cli.client.get_session_status()["state"] == "secure"
+    print("[SUCCESS] Requêtes malformées rejetées sans bloquer le daemon.")
+
+    ipc.stop()
+    assert cli.client.closed.wait(2)
+    assert not os.path.exists(path)
+    alice.close()
+    bob.close()
+
+if __name__ == "__main__":
+    test_codec()
+    test_daemon_ipc()
@@ -0,0 +1,56 @@
+import sys
+import os
+import time
+import threading
+
+# Ajout du path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from protocol.outbox import Outbox
+
+def test_outbox():
+    print("=== TEST OUTBOX ===")
+    results = []
+    done = threading.Event()
+    release = threading.Event()
+
+    def slow_send(msg_id, text):
+        # Simule un pair lent (fenêtre TCP pleine)
+        release.wait(5)
+        return text != "KO"
+
+    def on_result(msg_id, success, error):
+        results.append((msg_id, success, error))
+        if len(results) == 2:
+            done.set()
+
+    outbox = Outbox(slow_send, on_result)
+
+    start = time.perf_counter()
+    id_ok = outbox.enqueue("OK")
+    id_ko = outbox.enqueue("KO")
+    elapsed = time.perf_counter() - start
+    print(f"    - Mise en file de 2 messages : {elapsed * 1000:.2f} ms")
+    assert elapsed < 0.5, "enqueue ne doit pas attendre l'envoi"
+    assert id_ok != id_ko
+
+    release.set()
+    assert done.wait(5)
+    assert results[0] == (id_ok, True, None)
+    assert results[1][0] == id_ko and results[1][1] is False
+    print("[SUCCESS] Résultats de livraison remontés dans l'ordre.")
+
+    # Les messages restant en file à l'arrêt sont signalés en échec
+    release.clear()
+    results.clear()
+    done.clear()
+    outbox.enqueue("bloqué")
+    outbox.enqueue("jamais envoyé")
+    outbox.stop()
+    release.set()
+    assert done.wait(5)
+    assert results[1][1] is False and results[1][2] == "Déconnecté"
+    print("[SUCCESS] File vidée à l'arrêt.")
+
+if __name__ == "__main__":
+    test_outbox()
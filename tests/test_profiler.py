@@ -0,0 +1,138 @@
+import sys
+import os
+import time
+import signal
+import zipfile
+import tempfile
+import threading
+import tracemalloc
+import cProfile
+
+# Ajout du path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from diagnostics.profiler import CAPTURE, DETERMINISTIC, install_signal_handler
+from protocol.secure_protocol import SecureMessenger
+
+def test_capture_artifact():
+    print("=== TEST CAPTURE DE PROFILAGE ===")
+    CAPTURE.directory = tempfile.mkdtemp()
+    received = []
+    all_received = threading.Event()
+    secure = threading.Event()
+
+    def on_message(text):
+        received.append(text)
+        if len(received) == 20:
+            all_received.set()
+
+    bob = SecureMessenger(on_message, None)
+    alice = SecureMessenger(None, lambda msg, ok, fp: ok and secure.set())
+    threading.Thread(target=bob.start_server, args=(8884, '127.0.0.1'), daemon=True).start()
+    time.sleep(0.3)
+    alice.connect('127.0.0.1', 8884)
+    assert secure.wait(5)
+    time.sleep(0.2)
+
+    # Désactivée : aucun profileur créé par le trafic
+    alice.queue_message("hors capture")
+    time.sleep(0.3)
+    assert not CAPTURE.active and CAPTURE._profiles == {}
+
+    CAPTURE.start(duration=10)
+    for i in range(20):
+        alice.queue_message(f"message {i}")
+    assert all_received.wait(5)
+    path = CAPTURE.stop()
+    assert path and not CAPTURE.active
+
+    # Python >= 3.12 : échantillonnage (un seul profileur sys.monitoring par processus)
+    dump = "prof" if DETERMINISTIC else "folded"
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        print(f"    - Archive : {sorted(names)}")
+        assert {"summary.txt", "memory.txt", "stacks-start.txt", "stacks-end.txt",
+                "profile-receive.txt", "profile-send.txt",
+                f"profile-receive.{dump}", f"profile-send.{dump}"} <= names
+        if DETERMINISTIC:
+            assert "decrypt_message" in archive.read("profile-receive.txt").decode()
+            assert "encrypt_message" in archive.read("profile-send.txt").decode()
+        assert "_receive_loop" in archive.read("stacks-end.txt").decode()
+    assert CAPTURE.artifact_path(os.path.basename(path)) == path
+    assert CAPTURE.artifact_path("../../etc/passwd") is None
+    print("[SUCCESS] Profils envoi/réception, mémoire et piles archivés.")
+
+    alice.close()
+    bob.close()
+
+def busy_handler():
+    """Traitement long : vu par l'échantillonneur."""
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        pass
+    return "traité"
+
+def test_sampling_mode():
+    print("=== TEST CAPTURE PAR ÉCHANTILLONNAGE ===")
+    CAPTURE.directory = tempfile.mkdtemp()
+    CAPTURE.start(duration=10, memory=False, sampling=True)
+    result = []
+    worker = threading.Thread(target=lambda: result.append(CAPTURE.run('receive', busy_handler)),
+                              name='rx-test')
+    worker.start()
+    worker.join()
+    assert result == ["traité"]
+    path = CAPTURE.stop()
+
+    with zipfile.ZipFile(path) as archive:
+        assert "busy_handler" in archive.read("profile-receive.txt").decode()
+        assert "test_profiler.py:busy_handler" in archive.read("profile-receive.folded").decode()
+        assert "rx-test" in archive.read("summary.txt").decode()
+    print("[SUCCESS] Piles échantillonnées attribuées au rôle et au thread.")
+
+class RefusedProfile(cProfile.Profile):
+    """Comme sous Python 3.12+ quand un autre profileur est déjà actif."""
+
+    def enable(self, *args, **kwargs):
+        raise ValueError("Another profiling tool is already active")
+
+def test_profiler_unavailable():
+    print("=== TEST PROFILEUR INDISPONIBLE ===")
+    CAPTURE.directory = tempfile.mkdtemp()
+    CAPTURE.start(duration=10, sampling=False)
+    CAPTURE._profiles[('send', threading.current_thread().name)] = RefusedProfile()
+    assert CAPTURE.run('send', lambda x: x * 2, 21) == 42, "Le traitement doit aboutir"
+    assert CAPTURE._busy == 0 and not CAPTURE._local.profiling
+
+    path = CAPTURE.stop()
+    assert path and not tracemalloc.is_tracing()
+    with zipfile.ZipFile(path) as archive:
+        assert "profile-send.txt" not in archive.namelist()
+        assert "already active" in archive.read("summary.txt").decode()
+    print("[SUCCESS] enable() refusé : paquet traité, archive écrite, tracemalloc arrêté.")
+
+def test_time_bound_and_signal():
+    print("=== TEST CAPTURE BORNÉE / SIGNAL ===")
+    CAPTURE.directory = tempfile.mkdtemp()
+    count = len(CAPTURE.artifacts)
+
+    CAPTURE.start(duration=1, memory=False)
+    time.sleep(1.5)
+    assert not CAPTURE.active and len(CAPTURE.artifacts) == count + 1
+    print("[SUCCESS] Capture arrêtée seule à l'échéance.")
+
+    if install_signal_handler(duration=30):
+        os.kill(os.getpid(), signal.SIGUSR1)
+        time.sleep(0.3)
+        assert CAPTURE.active
+        os.kill(os.getpid(), signal.SIGUSR1)
+        time.sleep(0.5)
+        assert not CAPTURE.active and len(CAPTURE.artifacts) == count + 2
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        print("[SUCCESS] SIGUSR1 démarre puis arrête la capture.")
+
+if __name__ == "__main__":
+    test_capture_artifact()
+    test_sampling_mode()
+    test_profiler_unavailable()
+    test_time_bound_and_signal()
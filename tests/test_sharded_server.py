@@ -0,0 +1,112 @@
+import sys
+import os
+import time
+import socket
+
+# Ajout du path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from protocol.sharded_server import ShardedServer
+from protocol.secure_protocol import SecureMessenger
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_sharded_server():
+    print("=== TEST SERVEUR MULTI-PROCESSUS (SO_REUSEPORT) ===")
+    events = []
+    server = ShardedServer(8879, workers=2, host='127.0.0.1',
+                           on_event=lambda sid, kind, data: events.append((sid, kind, data)))
+    server.start()
+    try:
+        assert wait_for(lambda: len([w for w in server.snapshot()["workers"] if w["pid"]]) == 2)
+        pids = {w["pid"] for w in server.snapshot()["workers"]}
+        assert len(pids) == 2 and os.getpid() not in pids
+        print(f"    - Workers : {sorted(pids)}")
+
+        # Plusieurs clients : chacun obtient sa propre session dans un worker
+        received = {}
+        clients = []
+        for i in range(4):
+            received[i] = []
+            client = SecureMessenger(received[i].append, None)
+            client.connect('127.0.0.1', 8879)
+            clients.append(client)
+
+        assert wait_for(lambda: sum(s["is_secure"] for s in server.snapshot()["sessions"]) == 4)
+        sessions = server.snapshot()["sessions"]
+        print(f"    - Sessions par worker : {[w['sessions'] for w in server.snapshot()['workers']]}")
+        print("[SUCCESS] 4 sessions sécurisées réparties entre les workers.")
+
+        # Client -> worker -> parent
+        clients[0].queue_message("vers le hub")
+        assert wait_for(lambda: any(k == 'message' and d["text"] == "vers le hub" for _, k, d in events))
+
+        # Parent -> worker propriétaire -> client
+        for session in sessions:
+            assert server.send(session["id"], f"depuis le hub {session['id']}")
+        assert wait_for(lambda: all(len(r) == 1 for r in received.values()))
+        assert wait_for(lambda: sum(s["sent"] for s in server.snapshot()["sessions"]) == 4)
+        print("[SUCCESS] Événements agrégés et envois routés vers le bon worker.")
+
+        for client in clients:
+            client.close()
+        assert wait_for(lambda: not server.snapshot()["sessions"])
+    finally:
+        server.stop()
+
+def test_worker_listen_error():
+    print("=== TEST WORKER SANS ÉCOUTE ===")
+    # Port déjà pris par un socket sans SO_REUSEPORT : bind() échoue dans le worker
+    busy = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    busy.bind(('127.0.0.1', 8886))
+    busy.listen(1)
+    events = []
+    server = ShardedServer(8886, workers=1, host='127.0.0.1',
+                           on_event=lambda sid, kind, data: events.append((sid, kind, data)))
+    server.start()
+    try:
+        assert wait_for(lambda: server.snapshot()["workers"][0]["error"])
+        assert wait_for(lambda: any(k == 'worker' and d.get("error") for _, k, d in events))
+        assert wait_for(lambda: not server.snapshot()["workers"][0]["alive"])
+        worker = server.snapshot()["workers"][0]
+        print(f"[SUCCESS] Erreur remontée : {worker['error']}")
+    finally:
+        server.stop()
+        busy.close()
+
+def test_dead_worker_sessions():
+    print("=== TEST WORKER MORT ===")
+    events = []
+    server = ShardedServer(8890, workers=1, host='127.0.0.1',
+                           on_event=lambda sid, kind, data: events.append((sid, kind, data)))
+    server.start()
+    client = SecureMessenger(lambda _: None, None)
+    try:
+        assert wait_for(lambda: server.snapshot()["workers"][0]["pid"])
+        client.connect('127.0.0.1', 8890)
+        assert wait_for(lambda: any(s["is_secure"] for s in server.snapshot()["sessions"]))
+        session_id = server.snapshot()["sessions"][0]["id"]
+
+        # Worker tué : plus aucun événement ne remontera pour ses sessions
+        server.processes[0].kill()
+        server.processes[0].join(5)
+        assert not server.send(session_id, "vers un worker mort")
+        assert not server.snapshot()["sessions"]
+        assert server.snapshot()["workers"][0]["sessions"] == 0
+        assert any(sid == session_id and k == 'status' and d["status"] == "Déconnecté"
+                   for sid, k, d in events)
+        print("[SUCCESS] Sessions du worker mort retirées, envoi refusé.")
+    finally:
+        client.close()
+        server.stop()
+
+if __name__ == "__main__":
+    test_sharded_server()
+    test_worker_listen_error()
+    test_dead_worker_sessions()
@@ -0,0 +1,114 @@
+import sys
+import os
+import time
+import threading
+
+# Ajout du path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from protocol.secure_protocol import SecureMessenger
+from network.udp_transport import UdpNetworkManager
+
+def test_udp_lossy_link():
+    print("=== TEST TRANSPORT UDP (LIEN AVEC PERTES) ===")
+    received = []
+    presences = []
+    delivered = []
+    secure = threading.Event()
+    all_delivered = threading.Event()
+    count = 20
+
+    def on_result(msg_id, status, error=None):
+        if status == "delivered":
+            delivered.append(msg_id)
+            if len(delivered) == count:
+                all_delivered.set()
+
+    def on_status(msg, is_secure, fp):
+        print(f"[ALICE STATUS] {msg}")
+        if is_secure:
+            secure.set()
+
+    bob = SecureMessenger(received.append, None, transport='udp', on_presence=presences.append)
+    alice = SecureMessenger(None, on_status, on_result, transport='udp')
+
+    # Perte simulée : un datagramme sur trois est jeté (handshake, messages, ACK...)
+    sent = {"n": 0}
+    real_send_many = alice.net.send_many
+    def lossy_send_many(frames):
+        kept = []
+        for frame in frames:
+            sent["n"] += 1
+            if sent["n"] % 3:
+                kept.append(frame)
+        return real_send_many(kept) if kept else True
+    alice.net.send_many = lossy_send_many
+
+    threading.Thread(target=bob.start_server, args=(8878, '127.0.0.1'), daemon=True).start()
+    time.sleep(0.3)
+    alice.connect('127.0.0.1', 8878)
+    assert secure.wait(5), "Handshake UDP non terminé malgré les retransmissions"
+
+    ids = [alice.queue_message(f"message {i}") for i in range(count)]
+    assert all_delivered.wait(10), f"{len(delivered)}/{count} messages acquittés"
+    print(f"    - {sent['n']} datagrammes émis par Alice pour {count} messages")
+
+    # Chaque message est présenté une seule fois, même retransmis
+    assert sorted(received) == sorted(f"message {i}" for i in range(count))
+    assert set(delivered) == set(ids)
+    assert alice.store.pending() == []
+    print("[SUCCESS] Retransmission sélective : tous les messages livrés une fois.")
+
+    # Présence : sans garantie, mais passe sur un lien sans perte
+    alice.net.send_many = real_send_many
+    alice.send_presence("en ligne")
+    time.sleep(0.5)
+    assert presences == ["en ligne"]
+    print("[SUCCESS] Présence fire-and-forget reçue.")
+
+    # Message plus grand qu'un paquet (sans fragmentation IP) : refusé avant toute séquence
+    assert alice.max_message_bytes + alice.MESSAGE_OVERHEAD == alice.net.MAX_FRAME
+    assert alice.queue_message("é" * (alice.max_message_bytes // 2 + 1)) is None
+    assert alice.store.pending() == [] and alice.tx_seq == count
+    assert alice.send_message("x" * alice.max_message_bytes), "Message à la limite accepté"
+    assert alice.send_message("après le refus")
+    time.sleep(0.5)
+    assert received[-2:] == ["x" * alice.max_message_bytes, "après le refus"]
+    assert not alice.in_flight
+    print("[SUCCESS] Message trop long refusé sans bloquer la fenêtre.")
+
+    alice.close()
+    bob.close()
+
+def test_udp_handshake_timeout():
+    print("=== TEST ÉCHÉANCE DU HANDSHAKE UDP ===")
+    statuses = []
+    failed = threading.Event()
+
+    def on_status(msg, is_secure, fp):
+        statuses.append(msg)
+        if msg.startswith("Erreur"):
+            failed.set()
+
+    # Aucun pair à cette adresse : la clé est renvoyée jusqu'à l'échéance
+    alice = SecureMessenger(None, on_status, transport='udp')
+    alice.HANDSHAKE_TIMEOUT = 0.5
+    alice.connect('127.0.0.1', 8885)
+    assert failed.wait(3), f"Handshake jamais abandonné : {statuses}"
+    time.sleep(0.2)  # Statut annoncé avant la fermeture
+    assert alice.state.name == "IDLE"
+    print(f"[SUCCESS] Handshake abandonné : {statuses[-1]}")
+
+def test_udp_port_in_use():
+    print("=== TEST PORT UDP DÉJÀ PRIS ===")
+    first, second = UdpNetworkManager(), UdpNetworkManager()
+    assert first.listen(8889, '127.0.0.1')
+    assert not second.listen(8889, '127.0.0.1'), "Port UDP partagé par deux serveurs"
+    assert second.sock is None
+    first.close()
+    print("[SUCCESS] Second serveur sur le même port refusé.")
+
+if __name__ == "__main__":
+    test_udp_lossy_link()
+    test_udp_handshake_timeout()
+    test_udp_port_in_use()